@@ -0,0 +1,94 @@
+"""In-process cache of session token -> user snapshot for get_current_user."""
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional, Set
+
+
+class _Entry(NamedTuple):
+    user: dict
+    user_id: str
+    expires: float  # time.monotonic() deadline
+    size: int
+
+
+class SessionCache:
+    """LRU cache bounded by entry count and approximate snapshot bytes.
+
+    Entries live for at most `ttl` seconds and never past the session's own
+    expiry. Callers must invalidate explicitly on logout and on any change to
+    the cached user; the TTL only bounds staleness across worker processes.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[dict]:
+        entry = self._entries.get(token)
+        if entry is None or entry.expires <= time.monotonic():
+            if entry is not None:
+                self._drop(token)
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(token)
+        self.stats["hits"] += 1
+        return entry.user
+
+    def put(self, token: str, user: dict, session_expires_at: datetime):
+        remaining = (session_expires_at - datetime.now(timezone.utc)).total_seconds()
+        ttl = min(self.ttl, remaining)
+        if ttl <= 0:
+            return
+        if token in self._entries:
+            self._drop(token)
+        size = len(json.dumps(user, default=str)) + len(token)
+        entry = _Entry(user, user["user_id"], time.monotonic() + ttl, size)
+        self._entries[token] = entry
+        self._tokens_by_user.setdefault(entry.user_id, set()).add(token)
+        self.bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def _drop(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        self.bytes -= entry.size
+        tokens = self._tokens_by_user.get(entry.user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry.user_id]
+
+    def invalidate_token(self, token: str):
+        if token in self._entries:
+            self._drop(token)
+            self.stats["invalidations"] += 1
+
+    def invalidate_user(self, user_id: str):
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._drop(token)
+            self.stats["invalidations"] += 1
+
+    def report(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else None,
+        }
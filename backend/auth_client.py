@@ -0,0 +1,142 @@
+"""Async client for the Emergent Auth session exchange."""
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+
+DEFAULT_AUTH_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+
+
+class AuthServiceError(Exception):
+    """The auth service failed or could not be reached"""
+
+
+class CircuitOpenError(AuthServiceError):
+    """The circuit breaker is open; the call was not attempted"""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures.
+
+    While open every call fails fast. After `reset_timeout` seconds a single
+    trial call is let through (half-open); its outcome closes or re-opens
+    the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def release(self):
+        """End a call without a verdict on the service's health"""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class EmergentAuthClient:
+    """Shared keep-alive HTTP client with bounded concurrency and a circuit breaker."""
+
+    def __init__(
+        self,
+        url: str = DEFAULT_AUTH_URL,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        max_concurrency: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.breaker = breaker or CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def open(self):
+        """Create the pooled client up front; building its SSL context is slow"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        self.open()
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def session_data(self, session_id: str) -> Optional[dict]:
+        """Exchange a session id for user data; None if the session is invalid"""
+        if not self.breaker.allow():
+            raise CircuitOpenError("Authentication service circuit is open")
+        # Only the auth service's own failures count against it; local
+        # saturation, cancellation and client errors just give back the
+        # half-open trial slot
+        healthy: Optional[bool] = None
+        try:
+            try:
+                # Waiting for a slot counts against the same timeout as the request
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                raise AuthServiceError("Timed out waiting for an auth service connection")
+            try:
+                try:
+                    response = await self.client.get(self.url, headers={"X-Session-ID": session_id})
+                except httpx.HTTPError as e:
+                    healthy = False
+                    raise AuthServiceError(str(e)) from e
+            finally:
+                self._semaphore.release()
+            if response.status_code >= 500:
+                healthy = False
+                raise AuthServiceError(f"Auth service returned {response.status_code}")
+            if response.status_code != 200:
+                healthy = True
+                return None
+            try:
+                data = response.json()
+            except ValueError as e:
+                healthy = False
+                raise AuthServiceError("Auth service returned a malformed body") from e
+            healthy = True
+            return data
+        finally:
+            if healthy is True:
+                self.breaker.record_success()
+            elif healthy is False:
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
@@ -0,0 +1,119 @@
+"""Local stand-in for the Emergent Auth service, plus an event-loop stall probe.
+
+    python auth_stub.py serve --port 8765 --delay 0.3
+    python auth_stub.py measure-stall --logins 50 --delay 0.3
+
+Point the backend at the stub with
+EMERGENT_AUTH_URL=http://127.0.0.1:8765/auth/v1/env/oauth/session-data.
+`measure-stall` compares the old blocking `requests.get` exchange with
+EmergentAuthClient and reports how long the event loop was frozen.
+"""
+import asyncio
+import socket
+import threading
+import time
+import uuid
+
+import requests
+import typer
+import uvicorn
+from fastapi import FastAPI, Header, HTTPException
+
+from auth_client import EmergentAuthClient
+
+SESSION_DATA_PATH = "/auth/v1/env/oauth/session-data"
+
+cli = typer.Typer(help="Emergent Auth stub server")
+
+
+def create_stub_app(delay: float = 0.0, fail: bool = False) -> FastAPI:
+    stub = FastAPI()
+
+    @stub.get(SESSION_DATA_PATH)
+    async def session_data(x_session_id: str = Header(...)):
+        await asyncio.sleep(delay)
+        if fail:
+            raise HTTPException(status_code=503, detail="Stub auth service failing")
+        if x_session_id == "invalid":
+            raise HTTPException(status_code=401, detail="Invalid session")
+        return {
+            "id": x_session_id,
+            "email": f"{x_session_id}@stub.local",
+            "name": f"Stub User {x_session_id}",
+            "picture": None,
+            "session_token": f"stub_{uuid.uuid4().hex}",
+        }
+
+    return stub
+
+
+def start_stub_server(delay: float = 0.0, fail: bool = False, port: int = 0):
+    """Run the stub on a background thread; returns (session-data URL, server)"""
+    if not port:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_stub_app(delay, fail), port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}{SESSION_DATA_PATH}", server
+
+
+async def measure_stall(url: str, logins: int, mode: str, interval: float = 0.005) -> dict:
+    """Run `logins` concurrent exchanges while sampling event-loop lag"""
+    lags = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, time.monotonic() - started - interval))
+
+    client = EmergentAuthClient(url)
+    client.open()
+
+    async def login(i: int):
+        if mode == "blocking":
+            # The pre-change code path: a synchronous call inside the handler
+            requests.get(url, headers={"X-Session-ID": f"user{i}"}, timeout=10)
+        else:
+            await client.session_data(f"user{i}")
+
+    probe = asyncio.create_task(heartbeat())
+    await asyncio.sleep(interval * 2)
+    started = time.monotonic()
+    await asyncio.gather(*(login(i) for i in range(logins)))
+    wall = time.monotonic() - started
+    done.set()
+    await probe
+    await client.aclose()
+    return {
+        "mode": mode,
+        "logins": logins,
+        "wall_seconds": round(wall, 3),
+        "max_stall_ms": round(max(lags, default=0.0) * 1000, 1),
+        "total_stall_ms": round(sum(lags) * 1000, 1),
+    }
+
+
+@cli.command()
+def serve(port: int = 8765, delay: float = 0.3, fail: bool = False):
+    """Serve the stub until interrupted."""
+    uvicorn.run(create_stub_app(delay, fail), port=port, log_level="info")
+
+
+@cli.command("measure-stall")
+def measure_stall_command(logins: int = 20, delay: float = 0.3):
+    """Compare event-loop stall for blocking vs async session exchanges."""
+    url, server = start_stub_server(delay)
+    try:
+        for mode in ("blocking", "async"):
+            typer.echo(asyncio.run(measure_stall(url, logins, mode)))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,592 @@
+"""In-process load benchmark for the API.
+
+    python benchmark.py run --requests 2000 --concurrency 32 --output bench/head.json
+    python benchmark.py run --mongo-url mongodb://localhost:27017
+    python benchmark.py compare bench/base.json bench/head.json
+    python benchmark.py serialization --rows 50 --image-kb 256
+    python benchmark.py payloads --rows 50 --image-kb 256
+    python benchmark.py cold-start --runs 5
+
+`run` drives the FastAPI app through httpx's ASGI transport, so no server or
+network is involved. It uses a scratch database on a local mongod, or with
+--mongo-url memory (the default) an in-memory mongomock-motor stand-in, and
+replaces the image model with a fake that returns a random PNG after
+--gen-latency seconds. It reports p50/p95/p99 latency and throughput per
+route and can save the report as JSON. The in-memory store runs on the event
+loop itself, so memory runs compare CPU cost between commits; use a mongod
+for absolute latencies. `compare` diffs two reports and exits non-zero when
+any route's p95 regressed by more than --threshold. `serialization` measures
+the CPU each read endpoint spends building models versus writing documents
+straight to JSON with orjson. `payloads` compares body size and encode/decode
+time of the JSON, MessagePack and CBOR representations. `cold-start` times
+fresh processes from spawn to the first served request, split into phases.
+"""
+import asyncio
+import base64
+import io
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+import typer
+from PIL import Image
+
+from image_providers import PROVIDERS, GeneratedImage, ImageProvider
+
+cli = typer.Typer(help="JigsawMaster API benchmarks")
+
+CATEGORIES = ["animals", "nature", "food", "objects", "vehicles", "buildings"]
+DIFFICULTIES = [9, 16, 25, 36, 49, 64, 81, 100]
+
+# Route name -> relative weight of the traffic mix
+DEFAULT_MIX = {
+    "POST /api/puzzles/generate": 2,
+    "GET /api/puzzles": 20,
+    "GET /api/puzzles/{id}": 10,
+    "POST /api/progress/complete": 20,
+    "GET /api/progress/user/{id}": 8,
+    "GET /api/leaderboard/global": 15,
+    "GET /api/leaderboard/category/{category}": 10,
+    "GET /api/auth/me": 15,
+}
+
+
+class FakeImageProvider(ImageProvider):
+    """Stands in for the remote image model: a noise PNG after a fixed delay"""
+
+    name = "benchmark"
+
+    def __init__(self, latency: float = 0.0, size: int = 256):
+        self.latency = latency
+        self.size = size
+        self.calls = 0
+
+    async def generate(self, category: str, prompt: str) -> GeneratedImage:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        pixels = np.random.randint(0, 256, (self.size, self.size, 3), dtype=np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(pixels).save(buf, "PNG")
+        return GeneratedImage(buf.getvalue(), self.name)
+
+
+def load_app(mongo_url: str, gen_latency: float):
+    """Import server.py against a scratch database and the fake image provider"""
+    os.environ["MONGO_URL"] = "mongodb://localhost:27017" if mongo_url == "memory" else mongo_url
+    os.environ["DB_NAME"] = f"jigsaw_bench_{uuid.uuid4().hex[:8]}"
+    os.environ["IMAGE_PROVIDER"] = FakeImageProvider.name
+    os.environ["IMAGE_FALLBACK_PROVIDER"] = ""
+    PROVIDERS[FakeImageProvider.name] = lambda: FakeImageProvider(gen_latency)
+    os.environ["IMAGE_POOL_ENABLED"] = "false"
+    os.environ["BLOB_STORE"] = "local"
+    os.environ["BLOB_STORE_PATH"] = tempfile.mkdtemp(prefix="jigsaw_bench_blobs_")
+    if mongo_url == "memory":
+        try:
+            import mongomock_motor
+        except ImportError:
+            raise typer.BadParameter("--mongo-url memory needs mongomock-motor (pip install mongomock-motor)")
+        import motor.motor_asyncio
+        motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+
+    import server
+    # httpx logs every request at INFO, which would dominate the run
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return server
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    return float(np.percentile(sorted_values, pct)) if sorted_values else 0.0
+
+
+def summarize(latencies: List[float], errors: int, wall: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / wall, 1) if wall else 0.0,
+        "mean_ms": round(float(np.mean(values)) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+class TrafficGenerator:
+    """Builds and issues one request of a given route against seeded data"""
+
+    def __init__(self, server, client: httpx.AsyncClient, users: int, seed: int):
+        self.server = server
+        self.client = client
+        self.users = users
+        self.random = random.Random(seed)
+        self.user_ids: List[str] = []
+        self.tokens: List[str] = []
+        self.puzzle_ids: List[str] = []
+
+    async def seed(self, puzzles: int):
+        """Users with live sessions, and puzzles made through the API"""
+        db = self.server.db
+        now = datetime.now(timezone.utc)
+        users, sessions = [], []
+        for i in range(self.users):
+            user_id = f"bench_user_{i}"
+            users.append({
+                "user_id": user_id, "username": f"bench{i}", "email": f"bench{i}@example.com",
+                "created_at": now, "total_score": 0, "puzzles_completed": 0, "preferred_language": "en",
+            })
+            sessions.append({
+                "user_id": user_id, "session_token": f"bench_token_{i}",
+                "expires_at": now + timedelta(days=1), "created_at": now,
+            })
+            self.user_ids.append(user_id)
+            self.tokens.append(f"bench_token_{i}")
+        await db.users.insert_many(users)
+        await db.user_sessions.insert_many(sessions)
+        for i in range(puzzles):
+            response = await self.client.post("/api/puzzles/generate", json={
+                "category": CATEGORIES[i % len(CATEGORIES)],
+                "difficulty": DIFFICULTIES[i % len(DIFFICULTIES)],
+            })
+            response.raise_for_status()
+            self.puzzle_ids.append(response.json()["id"])
+
+    async def issue(self, route: str) -> httpx.Response:
+        r = self.random
+        if route == "POST /api/puzzles/generate":
+            response = await self.client.post("/api/puzzles/generate", json={
+                "category": r.choice(CATEGORIES), "difficulty": r.choice(DIFFICULTIES),
+            })
+            if response.status_code == 200:
+                self.puzzle_ids.append(response.json()["id"])
+            return response
+        if route == "GET /api/puzzles":
+            params = {"category": r.choice(CATEGORIES)} if r.random() < 0.5 else {}
+            return await self.client.get("/api/puzzles", params=params)
+        if route == "GET /api/puzzles/{id}":
+            return await self.client.get(f"/api/puzzles/{r.choice(self.puzzle_ids)}")
+        if route == "POST /api/progress/complete":
+            return await self.client.post("/api/progress/complete", json={
+                "user_id": r.choice(self.user_ids), "puzzle_id": r.choice(self.puzzle_ids),
+                "time_taken": r.randint(20, 600), "difficulty": r.choice(DIFFICULTIES),
+            })
+        if route == "GET /api/progress/user/{id}":
+            return await self.client.get(f"/api/progress/user/{r.choice(self.user_ids)}")
+        if route == "GET /api/leaderboard/global":
+            return await self.client.get("/api/leaderboard/global")
+        if route == "GET /api/leaderboard/category/{category}":
+            return await self.client.get(f"/api/leaderboard/category/{r.choice(CATEGORIES)}")
+        if route == "GET /api/auth/me":
+            return await self.client.get("/api/auth/me", headers={"Authorization": f"Bearer {r.choice(self.tokens)}"})
+        raise ValueError(f"Unknown route {route}")
+
+
+async def run_benchmark(
+    mongo_url: str,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    users: int,
+    puzzles: int,
+    gen_latency: float,
+    mix: Dict[str, int],
+    seed: int,
+) -> dict:
+    server = load_app(mongo_url, gen_latency)
+    app = server.create_app()
+    try:
+        async with app.router.lifespan_context(app):
+            try:
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                    traffic = TrafficGenerator(server, client, users, seed)
+                    await traffic.seed(puzzles)
+
+                    routes = list(mix)
+                    weights = [mix[route] for route in routes]
+                    plan = traffic.random.choices(routes, weights=weights, k=warmup + requests)
+                    latencies: Dict[str, List[float]] = defaultdict(list)
+                    errors: Dict[str, int] = defaultdict(int)
+                    position = 0
+
+                    async def worker():
+                        nonlocal position
+                        while position < len(plan):
+                            index, position = position, position + 1
+                            route = plan[index]
+                            started = time.perf_counter()
+                            try:
+                                response = await traffic.issue(route)
+                                failed = response.status_code >= 400
+                            except Exception:
+                                failed = True
+                            elapsed = time.perf_counter() - started
+                            if index < warmup:
+                                continue
+                            latencies[route].append(elapsed)
+                            if failed:
+                                errors[route] += 1
+
+                    warmup_done = time.perf_counter()
+                    await asyncio.gather(*(worker() for _ in range(concurrency)))
+                    wall = time.perf_counter() - warmup_done
+            finally:
+                await server.db.client.drop_database(os.environ["DB_NAME"])
+    finally:
+        shutil.rmtree(os.environ["BLOB_STORE_PATH"], ignore_errors=True)
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "mongo": "memory" if mongo_url == "memory" else "mongod",
+            "requests": requests,
+            "concurrency": concurrency,
+            "warmup": warmup,
+            "users": users,
+            "puzzles": puzzles,
+            "gen_latency": gen_latency,
+            "image_model_calls": server.image_provider.calls,
+            "mix": mix,
+        },
+        "routes": {
+            route: summarize(latencies[route], errors[route], wall)
+            for route in routes if latencies[route]
+        },
+        "total": summarize(all_latencies, sum(errors.values()), wall),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict):
+    header = f"{'route':<44}{'reqs':>7}{'err':>5}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    typer.echo(header)
+    typer.echo("-" * len(header))
+    for route, stats in [*report["routes"].items(), ("TOTAL", report["total"])]:
+        typer.echo(
+            f"{route:<44}{stats['requests']:>7}{stats['errors']:>5}{stats['throughput_rps']:>9}"
+            f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+        )
+
+
+def sample_documents(rows: int, image_kb: int):
+    """Puzzle documents as stored and leaderboard rows as served"""
+    from leaderboard import leaderboard_entry
+
+    image = base64.b64encode(os.urandom(image_kb * 1024)).decode() if image_kb else None
+    # Motor returns naive UTC datetimes
+    now = datetime.utcnow()
+    puzzles = [{
+        "id": str(uuid.uuid4()), "title": "Food Puzzle", "category": "food", "difficulty": 16,
+        "image_hash": None if image else uuid.uuid4().hex * 2, "image_base64": image,
+        "created_at": now - timedelta(minutes=i), "language": "en",
+    } for i in range(rows)]
+    entries = [leaderboard_entry({
+        "user_id": f"user_{i}", "username": f"player{i}", "total_score": 100000 - i * 7,
+        "puzzles_completed": 40 + i, "total_time": 9000 + i,
+    }) for i in range(rows)]
+    return puzzles, entries
+
+
+async def run_serialization_benchmark(rows: int, image_kb: int, iterations: int) -> List[dict]:
+    """CPU per request for model-validated vs direct orjson responses.
+
+    Both variants are mounted on a bare FastAPI app with the same
+    response_model, so the difference is only what the handler returns.
+    """
+    from fastapi import FastAPI
+    from fastapi.responses import ORJSONResponse
+
+    server = load_app("memory", 0.0)
+    puzzles, entries = sample_documents(rows, image_kb)
+
+    bench = FastAPI()
+
+    @bench.get("/model/puzzles", response_model=List[server.Puzzle])
+    async def model_puzzles():
+        return [server.Puzzle(**doc) for doc in puzzles]
+
+    @bench.get("/fast/puzzles", response_model=List[server.Puzzle])
+    async def fast_puzzles():
+        return ORJSONResponse([server.puzzle_payload(doc) for doc in puzzles])
+
+    @bench.get("/model/leaderboard", response_model=List[server.LeaderboardEntry])
+    async def model_leaderboard():
+        return [server.LeaderboardEntry(**row) for row in entries]
+
+    @bench.get("/fast/leaderboard", response_model=List[server.LeaderboardEntry])
+    async def fast_leaderboard():
+        return ORJSONResponse(entries)
+
+    results = []
+    transport = httpx.ASGITransport(app=bench)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name in ("puzzles", "leaderboard"):
+            cpu, body = {}, {}
+            for mode in ("model", "fast"):
+                path = f"/{mode}/{name}"
+                body[mode] = (await client.get(path)).content
+                started = time.process_time()
+                for _ in range(iterations):
+                    await client.get(path)
+                cpu[mode] = (time.process_time() - started) / iterations
+            results.append({
+                "endpoint": name,
+                "rows": rows,
+                "image_kb": image_kb if name == "puzzles" else 0,
+                "bytes": len(body["fast"]),
+                "identical": json.loads(body["model"]) == json.loads(body["fast"]),
+                "model_cpu_ms": round(cpu["model"] * 1000, 3),
+                "fast_cpu_ms": round(cpu["fast"] * 1000, 3),
+                "saved_pct": round((1 - cpu["fast"] / cpu["model"]) * 100, 1) if cpu["model"] else 0.0,
+            })
+    return results
+
+
+def run_payload_benchmark(rows: int, image_kb: int, iterations: int) -> List[dict]:
+    """Body size and codec time per response format.
+
+    Encoding is measured the way the server does it: from the JSON body the
+    handler produced to the negotiated format. Decoding is the client's cost.
+    """
+    import orjson
+    from content_negotiation import CBOR, JSON, MSGPACK, transcode_response
+
+    server = load_app("memory", 0.0)
+    puzzles, entries = sample_documents(rows, image_kb)
+    payloads = {
+        "puzzles": [server.puzzle_payload(doc) for doc in puzzles],
+        "leaderboard": entries,
+    }
+
+    def per_call_us(fn) -> float:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return round((time.perf_counter() - started) / iterations * 1e6, 1)
+
+    results = []
+    for name, payload in payloads.items():
+        body = orjson.dumps(payload)
+        for codec in (JSON, MSGPACK, CBOR):
+            if codec is JSON:
+                encoded = body
+                encode_us = per_call_us(lambda: orjson.dumps(payload))
+            else:
+                encoded = transcode_response(body, codec)
+                encode_us = per_call_us(lambda: transcode_response(body, codec))
+            results.append({
+                "endpoint": name,
+                "format": codec.name,
+                "rows": rows,
+                "image_kb": image_kb if name == "puzzles" else 0,
+                "bytes": len(encoded),
+                "vs_json_pct": round(len(encoded) / len(body) * 100, 1),
+                "encode_us": encode_us,
+                "decode_us": per_call_us(lambda: codec.loads(encoded)),
+            })
+    return results
+
+
+COLD_START_PHASES = ("interpreter", "import", "create_app", "lifespan", "first_request")
+
+
+def cold_start_probe_marks(mongo_url: str) -> Dict[str, float]:
+    """Wall-clock time at the end of each startup phase, in this process"""
+    marks = {"interpreter": time.time()}
+    server = load_app(mongo_url, 0.0)
+    marks["import"] = time.time()
+    app = server.create_app()
+    marks["create_app"] = time.time()
+
+    async def first_request():
+        async with app.router.lifespan_context(app):
+            marks["lifespan"] = time.time()
+            try:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+                    (await client.get("/api/puzzles")).raise_for_status()
+                marks["first_request"] = time.time()
+            finally:
+                await server.db.client.drop_database(os.environ["DB_NAME"])
+
+    try:
+        asyncio.run(first_request())
+    finally:
+        shutil.rmtree(os.environ["BLOB_STORE_PATH"], ignore_errors=True)
+    return marks
+
+
+def run_cold_start(runs: int, mongo_url: str) -> Dict[str, dict]:
+    """Spawn `runs` fresh processes and summarize seconds spent per phase"""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(runs):
+        spawned = time.time()
+        result = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "cold-start-probe", "--mongo-url", mongo_url],
+            capture_output=True, text=True, check=True,
+        )
+        marks = json.loads(result.stdout.strip().splitlines()[-1])
+        previous = spawned
+        for phase in COLD_START_PHASES:
+            durations[phase].append(marks[phase] - previous)
+            previous = marks[phase]
+        durations["total"].append(marks["first_request"] - spawned)
+    return {
+        phase: {"p50_ms": round(percentile(values, 50) * 1000, 1), "max_ms": round(max(values) * 1000, 1)}
+        for phase, values in durations.items()
+    }
+
+
+def parse_mix(mix: Optional[str]) -> Dict[str, int]:
+    """'GET /api/puzzles=5,GET /api/auth/me=1' -> weights; unlisted routes are dropped"""
+    if not mix:
+        return dict(DEFAULT_MIX)
+    weights = {}
+    for part in mix.split(","):
+        route, _, weight = part.rpartition("=")
+        if route not in DEFAULT_MIX:
+            raise typer.BadParameter(f"Unknown route {route!r}; choose from {', '.join(DEFAULT_MIX)}")
+        weights[route] = int(weight)
+    return weights
+
+
+@cli.command()
+def run(
+    requests: int = typer.Option(2000, help="Measured requests, after warmup"),
+    concurrency: int = typer.Option(32, help="Concurrent in-flight requests"),
+    warmup: int = typer.Option(200, help="Requests issued before measuring"),
+    users: int = typer.Option(200, help="Seeded users with live sessions"),
+    puzzles: int = typer.Option(24, help="Puzzles generated before the run"),
+    gen_latency: float = typer.Option(0.05, help="Seconds the fake image model takes"),
+    mongo_url: str = typer.Option("memory", help="mongodb:// URL of a local mongod, or 'memory'"),
+    mix: Optional[str] = typer.Option(None, help="Route weights, e.g. 'GET /api/puzzles=5,GET /api/auth/me=1'"),
+    seed: int = typer.Option(0, help="Random seed for the traffic plan"),
+    output: Optional[Path] = typer.Option(None, help="Write the JSON report here"),
+):
+    """Drive mixed traffic through the app and report latency per route."""
+    report = asyncio.run(run_benchmark(
+        mongo_url, requests, concurrency, warmup, users, puzzles, gen_latency, parse_mix(mix), seed
+    ))
+    print_report(report)
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        typer.echo(f"\nSaved {output}")
+
+
+@cli.command()
+def compare(
+    baseline: Path,
+    candidate: Path,
+    threshold: float = typer.Option(0.10, help="Allowed relative p95 increase per route"),
+):
+    """Compare two saved reports; exit 1 if any route's p95 regressed past the threshold."""
+    base = json.loads(baseline.read_text())
+    head = json.loads(candidate.read_text())
+    typer.echo(f"{base['meta'].get('commit')} -> {head['meta'].get('commit')}")
+    header = f"{'route':<44}{'p50 ms':>18}{'p95 ms':>18}{'rps':>18}"
+    typer.echo(header)
+    typer.echo("-" * len(header))
+
+    def cell(old: float, new: float) -> str:
+        change = (new - old) / old * 100 if old else 0.0
+        return f"{new:>9} ({change:+5.1f}%)"
+
+    regressed = []
+    routes = [route for route in head["routes"] if route in base["routes"]]
+    for route in routes + ["TOTAL"]:
+        old = base["total"] if route == "TOTAL" else base["routes"][route]
+        new = head["total"] if route == "TOTAL" else head["routes"][route]
+        typer.echo(
+            f"{route:<44}{cell(old['p50_ms'], new['p50_ms'])}{cell(old['p95_ms'], new['p95_ms'])}"
+            f"{cell(old['throughput_rps'], new['throughput_rps'])}"
+        )
+        if old["p95_ms"] and (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] > threshold:
+            regressed.append(route)
+    if regressed:
+        typer.echo(f"\np95 regressed by more than {threshold:.0%}: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+@cli.command()
+def serialization(
+    rows: int = typer.Option(50, help="Documents per response"),
+    image_kb: int = typer.Option(0, help="Size of a legacy inline image per puzzle, before base64"),
+    iterations: int = typer.Option(200, help="Requests per variant"),
+):
+    """Compare CPU per request for model-validated and direct orjson responses."""
+    results = asyncio.run(run_serialization_benchmark(rows, image_kb, iterations))
+    header = f"{'endpoint':<14}{'rows':>6}{'bytes':>12}{'model ms':>11}{'orjson ms':>11}{'saved':>8}  identical"
+    typer.echo(header)
+    typer.echo("-" * len(header))
+    for r in results:
+        typer.echo(
+            f"{r['endpoint']:<14}{r['rows']:>6}{r['bytes']:>12}{r['model_cpu_ms']:>11}"
+            f"{r['fast_cpu_ms']:>11}{r['saved_pct']:>7}%  {r['identical']}"
+        )
+
+
+@cli.command()
+def payloads(
+    rows: int = typer.Option(50, help="Documents per response"),
+    image_kb: int = typer.Option(0, help="Size of a legacy inline image per puzzle, before base64"),
+    iterations: int = typer.Option(200, help="Encodes and decodes per format"),
+):
+    """Compare body size and encode/decode time for JSON, MessagePack and CBOR."""
+    results = run_payload_benchmark(rows, image_kb, iterations)
+    header = f"{'endpoint':<14}{'format':<9}{'rows':>6}{'bytes':>12}{'vs json':>9}{'encode us':>11}{'decode us':>11}"
+    typer.echo(header)
+    typer.echo("-" * len(header))
+    for r in results:
+        typer.echo(
+            f"{r['endpoint']:<14}{r['format']:<9}{r['rows']:>6}{r['bytes']:>12}{r['vs_json_pct']:>8}%"
+            f"{r['encode_us']:>11}{r['decode_us']:>11}"
+        )
+
+
+@cli.command("cold-start")
+def cold_start(
+    runs: int = typer.Option(5, help="Fresh processes to start"),
+    mongo_url: str = typer.Option("memory", help="mongodb:// URL of a local mongod, or 'memory'"),
+):
+    """Time process spawn to first served request, split into startup phases."""
+    results = run_cold_start(runs, mongo_url)
+    header = f"{'phase':<16}{'p50 ms':>10}{'max ms':>10}"
+    typer.echo(header)
+    typer.echo("-" * len(header))
+    for phase, r in results.items():
+        typer.echo(f"{phase:<16}{r['p50_ms']:>10}{r['max_ms']:>10}")
+
+
+@cli.command("cold-start-probe", hidden=True)
+def cold_start_probe(mongo_url: str = typer.Option("memory")):
+    typer.echo(json.dumps(cold_start_probe_marks(mongo_url)))
+
+
+if __name__ == "__main__":
+    cli()
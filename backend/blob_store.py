@@ -0,0 +1,150 @@
+"""Content-addressed blob storage for puzzle images (GridFS or local disk)."""
+import asyncio
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+CHUNK_SIZE = 256 * 1024
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sniff_content_type(data: bytes) -> str:
+    """Best-effort image MIME type from magic bytes"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "application/octet-stream"
+
+
+class BlobStore:
+    """Stores each distinct payload once, keyed by its SHA-256 hex digest."""
+
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    async def stat(self, key: str) -> Optional[dict]:
+        """Return {"key", "length", "content_type"} or None if missing"""
+        raise NotImplementedError
+
+    def stream(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield the bytes in [start, end) in CHUNK_SIZE pieces"""
+        raise NotImplementedError
+
+    async def read(self, key: str) -> bytes:
+        return b"".join([chunk async for chunk in self.stream(key)])
+
+
+class GridFSBlobStore(BlobStore):
+    def __init__(self, db, bucket_name: str = "images"):
+        self.bucket_name = bucket_name
+        self.files = db[f"{bucket_name}.files"]
+        self._bucket: Optional[AsyncIOMotorGridFSBucket] = None
+
+    @property
+    def bucket(self) -> AsyncIOMotorGridFSBucket:
+        # Built on first use: the store may be created before Mongo is connected
+        if self._bucket is None:
+            self._bucket = AsyncIOMotorGridFSBucket(self.files.database, bucket_name=self.bucket_name)
+        return self._bucket
+
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> str:
+        key = content_hash(data)
+        if await self.files.find_one({"filename": key}, {"_id": 1}) is None:
+            # Filename is the content key; a racing duplicate upload is harmless
+            await self.bucket.upload_from_stream(
+                key,
+                data,
+                metadata={"content_type": content_type or sniff_content_type(data)},
+            )
+        return key
+
+    async def stat(self, key: str) -> Optional[dict]:
+        doc = await self.files.find_one({"filename": key}, {"length": 1, "metadata": 1})
+        if not doc:
+            return None
+        return {
+            "key": key,
+            "length": doc["length"],
+            "content_type": (doc.get("metadata") or {}).get("content_type", "application/octet-stream"),
+        }
+
+    async def stream(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        grid_out = await self.bucket.open_download_stream_by_name(key)
+        end = grid_out.length if end is None else end
+        grid_out.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = await grid_out.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class LocalDiskBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _write(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> str:
+        key = content_hash(data)
+        path = self._path(key)
+        if not path.exists():
+            await asyncio.to_thread(self._write, path, data)
+        return key
+
+    async def stat(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with path.open("rb") as f:
+                head = f.read(16)
+            length = path.stat().st_size
+        except FileNotFoundError:
+            return None
+        return {"key": key, "length": length, "content_type": sniff_content_type(head)}
+
+    async def stream(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(self._path(key).open, "rb")
+        try:
+            if end is None:
+                end = os.fstat(f.fileno()).st_size
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+
+def create_blob_store(db) -> BlobStore:
+    """Pick the backend from BLOB_STORE ("gridfs" or "local")"""
+    backend = os.environ.get("BLOB_STORE", "gridfs")
+    if backend == "local":
+        return LocalDiskBlobStore(os.environ.get("BLOB_STORE_PATH", str(Path(__file__).parent / "blobs")))
+    if backend == "gridfs":
+        return GridFSBlobStore(db)
+    raise ValueError(f"Unknown BLOB_STORE backend: {backend}")
@@ -0,0 +1,221 @@
+"""MessagePack and CBOR encodings of the JSON API, negotiated per request.
+
+Handlers keep producing JSON; the middleware transcodes at the edge. A
+client sends `Accept: application/msgpack` (or `application/cbor`) to get
+the binary form of any JSON response, and may send request bodies in either
+format by setting Content-Type. String fields named `*_base64` travel as raw
+bytes in the binary formats, under the same names, so images are not
+inflated by base64. JSON stays the default.
+"""
+import base64
+from functools import partial
+from typing import Any, Callable, List, NamedTuple, Optional
+
+import cbor2
+import msgpack
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+
+
+class Codec(NamedTuple):
+    name: str
+    media_type: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+JSON = Codec("json", "application/json", orjson.dumps, orjson.loads)
+MSGPACK = Codec(
+    "msgpack", "application/msgpack",
+    partial(msgpack.packb, use_bin_type=True, datetime=True),
+    partial(msgpack.unpackb, raw=False, timestamp=3),
+)
+CBOR = Codec("cbor", "application/cbor", cbor2.dumps, cbor2.loads)
+
+CODECS = {
+    "application/json": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/cbor": CBOR,
+}
+
+
+def _media_type(value: str) -> str:
+    return value.split(";", 1)[0].strip().lower()
+
+
+def negotiate(accept: Optional[str]) -> Codec:
+    """Highest-q supported codec in an Accept header, the first listed on ties.
+
+    Wildcards and unsupported types are ignored; JSON when nothing matches.
+    """
+    best, best_q = JSON, 0.0
+    for part in (accept or "").split(","):
+        media_type = _media_type(part)
+        codec = CODECS.get(media_type)
+        if codec is None:
+            continue
+        q = 1.0
+        for param in part.split(";")[1:]:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+
+def binary_fields(value):
+    """Decode `*_base64` strings in a JSON document to bytes"""
+    if isinstance(value, dict):
+        return {
+            key: base64.b64decode(item) if key.endswith("_base64") and isinstance(item, str) else binary_fields(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [binary_fields(item) for item in value]
+    return value
+
+
+def _json_default(value):
+    # Any bytes a binary client sends become base64 text, as JSON would carry them
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode()
+    raise TypeError(f"{type(value).__name__} has no JSON equivalent")
+
+
+def to_json(document) -> bytes:
+    return orjson.dumps(document, default=_json_default)
+
+
+def transcode_response(body: bytes, codec: Codec) -> bytes:
+    return codec.dumps(binary_fields(orjson.loads(body)))
+
+
+def _etag_for(etag: str, codec: Codec) -> str:
+    # Each representation needs its own validator: "abc" -> "abc-msgpack"
+    return f'{etag[:-1]}-{codec.name}"' if etag.endswith('"') else etag
+
+
+def _has_codec_etag(if_none_match: str, codec: Codec) -> bool:
+    suffix = f'-{codec.name}"'
+    return any(tag.strip().endswith(suffix) for tag in if_none_match.split(","))
+
+
+def _strip_etags(if_none_match: str, codec: Codec) -> str:
+    suffix = f'-{codec.name}"'
+    return ",".join(
+        tag.strip()[: -len(suffix)] + '"' if tag.strip().endswith(suffix) else tag.strip()
+        for tag in if_none_match.split(",")
+    )
+
+
+def _replace_header(scope: dict, name: bytes, value: Optional[bytes]):
+    # In place: outer middleware read what the router writes into this scope
+    headers: List = [(k, v) for k, v in scope["headers"] if k != name]
+    if value is not None:
+        headers.append((name, value))
+    scope["headers"] = headers
+
+
+class ContentNegotiationMiddleware:
+    """ASGI middleware serving JSON routes under `prefix` as MessagePack or CBOR.
+
+    Only complete `application/json` responses are transcoded; streams such
+    as SSE and NDJSON, non-JSON bodies and HEAD responses pass through
+    untouched.
+    """
+
+    def __init__(self, app, prefix: str = "/api"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        codec = negotiate(headers.get("accept"))
+        # A 304 revalidates whichever representation the client holds
+        revalidates_transcoded = False
+        if codec is not JSON and "if-none-match" in headers:
+            revalidates_transcoded = _has_codec_etag(headers["if-none-match"], codec)
+            _replace_header(scope, b"if-none-match", _strip_etags(headers["if-none-match"], codec).encode())
+
+        start = None
+        chunks = []
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+                is_json = _media_type(response_headers.get("content-type", "")) == JSON.media_type
+                if is_json or message["status"] == 304:
+                    response_headers.add_vary_header("Accept")
+                # HEAD has no body to transcode; its headers stay as sent
+                transcoded = codec is not JSON and is_json and scope["method"] != "HEAD"
+                if "etag" in response_headers and (
+                    transcoded or (message["status"] == 304 and revalidates_transcoded)
+                ):
+                    response_headers["etag"] = _etag_for(response_headers["etag"], codec)
+                if transcoded:
+                    start = message
+                    return
+                await send(message)
+                return
+
+            if start is None:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            response_headers = MutableHeaders(scope=start)
+            if body:
+                body = transcode_response(body, codec)
+                response_headers["content-type"] = codec.media_type
+            response_headers["content-length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        request_codec = CODECS.get(_media_type(headers.get("content-type", "")))
+        if request_codec is None or request_codec is JSON:
+            await self.app(scope, receive, send_wrapper)
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        try:
+            body = to_json(request_codec.loads(body)) if body else b""
+        except (ValueError, TypeError, EOFError):
+            detail = to_json({"detail": f"Malformed {request_codec.name} request body"})
+            await send_wrapper({"type": "http.response.start", "status": 400,
+                                "headers": [(b"content-type", b"application/json"),
+                                            (b"content-length", str(len(detail)).encode())]})
+            await send_wrapper({"type": "http.response.body", "body": detail})
+            return
+
+        _replace_header(scope, b"content-type", b"application/json")
+        _replace_header(scope, b"content-length", str(len(body)).encode())
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, replay, send_wrapper)
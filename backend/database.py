@@ -0,0 +1,68 @@
+"""MongoDB handle that services can hold before the app has connected."""
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+
+class LazyCollection:
+    """Collection reference that resolves against the database once connected"""
+
+    def __init__(self, database: "Database", name: str):
+        self._database = database
+        self._bound_to = None
+        self._collection = None
+        self.name = name
+
+    def _resolve(self):
+        db = self._database.motor
+        if db is not self._bound_to:
+            # (Re)bind after connect(), including a reconnect in the same process
+            self._bound_to, self._collection = db, db[self.name]
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
+
+
+class Database:
+    """Motor database proxy bound to a client by `connect()`.
+
+    Services are constructed at import time with collections taken from this
+    proxy, which hands out `LazyCollection`s until `connect()` runs and real
+    Motor collections afterwards. Importing the app therefore needs neither
+    MONGO_URL/DB_NAME nor a client, and forked workers never inherit one.
+    """
+
+    def __init__(self):
+        self.client: Optional[AsyncIOMotorClient] = None
+        self._db = None
+
+    def connect(self, url: str, name: str, **client_options):
+        self.client = AsyncIOMotorClient(url, **client_options)
+        self._db = self.client[name]
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self._db = None
+
+    @property
+    def motor(self):
+        """The connected Motor database"""
+        if self._db is None:
+            raise RuntimeError("MongoDB is not connected yet; the app's lifespan connects it")
+        return self._db
+
+    def __getitem__(self, name: str):
+        return self._db[name] if self._db is not None else LazyCollection(self, name)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._db is not None:
+            return getattr(self._db, name)
+        return LazyCollection(self, name)
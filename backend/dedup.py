@@ -0,0 +1,211 @@
+"""Perceptual-hash deduplication of generated puzzle images."""
+import asyncio
+import io
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # 8x8 bits -> 64-bit fingerprints
+POLICIES = ("off", "reuse", "reject")
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so dct(x) = C @ x @ C.T for a square block"""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(HASH_SIZE * 4)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def _grayscale(data: bytes, size: Tuple[int, int]) -> np.ndarray:
+    image = Image.open(io.BytesIO(data)).convert("L").resize(size, Image.LANCZOS)
+    return np.asarray(image, dtype=np.float64)
+
+
+def phash(data: bytes) -> int:
+    """DCT hash: low frequencies of a 32x32 thumbnail compared to their median"""
+    pixels = _grayscale(data, (HASH_SIZE * 4, HASH_SIZE * 4))
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    # The DC term only tracks overall brightness; keep it out of the median
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+def dhash(data: bytes) -> int:
+    """Difference hash: whether each pixel is brighter than its left neighbour"""
+    pixels = _grayscale(data, (HASH_SIZE + 1, HASH_SIZE))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+HASHES: Dict[str, Callable[[bytes], int]] = {"phash": phash, "dhash": dhash}
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance.
+
+    Each child edge is labelled with its distance to the parent, so a radius
+    search only descends into edges within `radius` of the query's distance
+    to the node (triangle inequality).
+    """
+
+    def __init__(self):
+        # node: [fingerprint, keys, {distance: child node}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, fingerprint: int, key: str):
+        self.size += 1
+        if self._root is None:
+            self._root = [fingerprint, [key], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(fingerprint, node[0])
+            if distance == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [fingerprint, [key], {}]
+                return
+            node = child
+
+    def search(self, fingerprint: int, radius: int) -> Iterator[Tuple[int, str]]:
+        """Yield (distance, key) for every stored fingerprint within `radius`"""
+        if self._root is None:
+            return
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(fingerprint, node[0])
+            if distance <= radius:
+                for key in node[1]:
+                    yield distance, key
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+
+    def nearest(self, fingerprint: int, radius: int) -> Optional[Tuple[int, str]]:
+        return min(self.search(fingerprint, radius), default=None)
+
+
+class IngestResult(NamedTuple):
+    key: Optional[str]  # Blob key to use; None when the policy rejected the image
+    duplicate_of: Optional[str] = None
+    distance: Optional[int] = None
+
+
+class ImageDeduplicator:
+    """Stores new images unless they are near-duplicates of stored ones.
+
+    Fingerprints persist in `collection` and are indexed in memory by a
+    BK-tree loaded at startup; fingerprints written by other processes are
+    picked up on the next load. With policy "reuse" a near-duplicate is
+    answered with the existing image's blob key and nothing is stored; with
+    "reject" it is dropped so the caller can generate another image.
+    """
+
+    def __init__(
+        self,
+        collection,
+        blob_store,
+        policy: str = "reuse",
+        max_distance: int = 6,
+        algorithm: str = "phash",
+        max_attempts: int = 3,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+        if algorithm not in HASHES:
+            raise ValueError(f"algorithm must be one of {', '.join(HASHES)}")
+        self.collection = collection
+        self.blob_store = blob_store
+        self.policy = policy
+        self.max_distance = max_distance
+        self.algorithm = algorithm
+        self.max_attempts = max_attempts
+        self.tree = BKTree()
+        self.stats = {"checked": 0, "unique": 0, "reused": 0, "rejected": 0, "errors": 0}
+
+    async def load(self):
+        docs = await self.collection.find(
+            {"algorithm": self.algorithm}, {"_id": 0, "image_hash": 1, "fingerprint": 1}
+        ).to_list(None)
+        tree = BKTree()
+        for doc in docs:
+            tree.add(int(doc["fingerprint"], 16), doc["image_hash"])
+        self.tree = tree
+
+    async def fingerprint(self, image: bytes) -> int:
+        return await asyncio.to_thread(HASHES[self.algorithm], image)
+
+    async def register(self, image_hash: str, fingerprint: int, category: Optional[str] = None):
+        try:
+            await self.collection.insert_one({
+                "image_hash": image_hash,
+                "algorithm": self.algorithm,
+                # Hex string: unsigned 64-bit values do not fit Mongo's int64
+                "fingerprint": f"{fingerprint:016x}",
+                "category": category,
+                "created_at": datetime.now(timezone.utc),
+            })
+        except DuplicateKeyError:
+            return  # Byte-identical image already fingerprinted
+        self.tree.add(fingerprint, image_hash)
+
+    async def ingest(self, image: bytes, category: Optional[str] = None) -> IngestResult:
+        """Store `image` in the blob store subject to the dedup policy"""
+        if self.policy == "off":
+            return IngestResult(await self.blob_store.put(image))
+
+        self.stats["checked"] += 1
+        try:
+            fingerprint = await self.fingerprint(image)
+        except Exception as e:
+            # Undecodable images are stored as before rather than lost
+            self.stats["errors"] += 1
+            logger.warning(f"Could not fingerprint image: {e}")
+            return IngestResult(await self.blob_store.put(image))
+
+        match = self.tree.nearest(fingerprint, self.max_distance)
+        if match is not None:
+            distance, existing = match
+            if self.policy == "reuse":
+                self.stats["reused"] += 1
+                return IngestResult(existing, existing, distance)
+            self.stats["rejected"] += 1
+            return IngestResult(None, existing, distance)
+
+        key = await self.blob_store.put(image)
+        await self.register(key, fingerprint, category)
+        self.stats["unique"] += 1
+        return IngestResult(key)
+
+    def report(self) -> dict:
+        return {
+            "policy": self.policy,
+            "algorithm": self.algorithm,
+            "max_distance": self.max_distance,
+            "fingerprints": len(self.tree),
+            **self.stats,
+        }
@@ -0,0 +1,114 @@
+"""Multi-resolution puzzle image derivatives, encoded on a process pool."""
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> maximum width in pixels (None keeps the original size)
+VARIANTS = {"thumb": 256, "medium": 768, "full": None}
+# Format name -> (Pillow encoder, MIME type)
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+
+
+def render_variant(data: bytes, width: Optional[int], fmt: str) -> bytes:
+    """Resize and re-encode one derivative. Runs inside a worker process."""
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    if width and image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    buf = io.BytesIO()
+    if fmt == "webp":
+        image.save(buf, "WEBP", quality=80, method=4)
+    else:
+        image.save(buf, "JPEG", quality=85, progressive=True, optimize=True)
+    return buf.getvalue()
+
+
+def negotiate(variant: Optional[str], width: Optional[int], fmt: Optional[str], accept: str):
+    """Pick (variant, format) from explicit parameters, a width hint and Accept.
+
+    Returns None when the client asked for nothing in particular, in which
+    case the original upload is served.
+    """
+    accepts_webp = "image/webp" in (accept or "")
+    if not (variant or width or fmt or accepts_webp):
+        return None
+    if not variant:
+        # Smallest variant at least as wide as the hint
+        variant = "full"
+        if width:
+            fitting = [(w, name) for name, w in VARIANTS.items() if w and w >= width]
+            if fitting:
+                variant = min(fitting)[1]
+    if not fmt:
+        fmt = "webp" if accepts_webp else "jpeg"
+    return variant, fmt
+
+
+class DerivativePipeline:
+    """Builds and caches thumb/medium/full renditions in WebP and progressive JPEG."""
+
+    def __init__(self, collection, blob_store, max_workers: Optional[int] = None):
+        self.collection = collection
+        self.blob_store = blob_store
+        self.max_workers = max_workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self):
+        if self.executor is None:
+            # Spawned workers avoid forking the event loop and Motor's threads
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def shutdown(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def render(self, image_hash: str, variant: str, fmt: str) -> str:
+        """Return the blob key of a derivative, encoding it on first use"""
+        query = {"image_hash": image_hash, "variant": variant, "format": fmt}
+        doc = await self.collection.find_one(query, {"_id": 0, "key": 1})
+        if doc:
+            return doc["key"]
+
+        self.start()
+        data = await self.blob_store.read(image_hash)
+        try:
+            encoded = await asyncio.get_running_loop().run_in_executor(
+                self.executor, render_variant, data, VARIANTS[variant], fmt
+            )
+        except BrokenProcessPool:
+            # A worker died; replace the pool so later renders can succeed
+            self.executor = None
+            raise
+        key = await self.blob_store.put(encoded, FORMATS[fmt][1])
+        await self.collection.update_one(query, {"$set": {"key": key, "size": len(encoded)}}, upsert=True)
+        return key
+
+    async def build_all(self, image_hash: str):
+        for variant in VARIANTS:
+            for fmt in FORMATS:
+                try:
+                    await self.render(image_hash, variant, fmt)
+                except Exception as e:
+                    logger.warning(f"Derivative {variant}/{fmt} failed for {image_hash}: {e}")
+
+    def schedule(self, image_hash: str):
+        """Build every derivative in the background, once per image at a time"""
+        if image_hash in self._tasks:
+            return
+        task = asyncio.create_task(self.build_all(image_hash))
+        self._tasks[image_hash] = task
+        task.add_done_callback(lambda _: self._tasks.pop(image_hash, None))
@@ -0,0 +1,106 @@
+"""Conditional GET helpers: validators, 304 responses and pre-serialized bodies."""
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against one ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def http_date(moment: datetime) -> str:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """True when the request's validators show the client copy is current.
+
+    If-Modified-Since is only consulted when there is no If-None-Match.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    since = request.headers.get("If-Modified-Since")
+    if since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # HTTP dates have whole-second precision
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def cached_json(request: Request, body: bytes, etag: str, cache_control: str,
+                last_modified: Optional[datetime] = None) -> Response:
+    """A 200 with `body` or an empty 304, both carrying the validators"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class StaticPayload:
+    """A JSON body serialized once, with a content-hash ETag.
+
+    There is no Last-Modified: the body is built at import time, so any date
+    would differ between workers and restarts while the ETag does not.
+    """
+
+    def __init__(self, payload, cache_control: str = "public, max-age=3600"):
+        self.body = json.dumps(payload, ensure_ascii=False).encode()
+        self.etag = body_etag(self.body)
+        self.cache_control = cache_control
+
+    def response(self, request: Request) -> Response:
+        return cached_json(request, self.body, self.etag, self.cache_control)
+
+
+def body_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class SerializedCache:
+    """LRU of serialized bodies and their ETags for documents that rarely change.
+
+    Entries are (body, last_modified, etag); whoever changes a document
+    must `discard` its entry.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, body: bytes, last_modified: Optional[datetime] = None) -> tuple:
+        entry = self._entries[key] = (body, last_modified, body_etag(body))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def discard(self, key: str):
+        self._entries.pop(key, None)
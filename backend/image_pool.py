@@ -0,0 +1,219 @@
+"""Warm pool of pre-generated puzzle images, persisted in MongoDB."""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from image_providers import GeneratedImage
+
+logger = logging.getLogger(__name__)
+
+
+class ImagePool:
+    """Keeps up to `high_water` ready images per category in `collection`.
+
+    `take()` pops the oldest pooled image for a category; a background task
+    refills every category back up to the high-water mark. Pooled documents
+    only reference their image by blob store key. Because the pool lives in
+    Mongo it survives restarts and is shared between workers. Every worker
+    runs a refill loop, but a category is only refilled by the worker that
+    holds its lease in `leases`, renewed after each generated image, so
+    one take never triggers a refill per worker.
+
+    `generate(category)` returns a GeneratedImage. `store(image, category)`
+    persists it and returns the fields to record with it (at least
+    "image_hash"), or None to discard it, e.g. as a near-duplicate of a
+    stored image; by default the bytes go to `blob_store` and the generator
+    and seed are kept. After `max_discards` discarded images in a row a
+    category is not refilled for `discard_backoff` seconds, so a stream of
+    near-duplicates does not turn into endless paid generations.
+    """
+
+    def __init__(
+        self,
+        collection,
+        blob_store,
+        generate: Callable[[str], Awaitable[GeneratedImage]],
+        categories: Iterable[str],
+        high_water: int = 3,
+        refill_interval: float = 30.0,
+        store: Optional[Callable[[GeneratedImage, str], Awaitable[Optional[dict]]]] = None,
+        max_discards: int = 3,
+        discard_backoff: float = 600.0,
+        leases=None,
+        lease: float = 120.0,
+    ):
+        self.collection = collection
+        self.leases = leases
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.blob_store = blob_store
+        self.generate = generate
+        self.categories = list(categories)
+        self.high_water = high_water
+        self.refill_interval = refill_interval
+        self.store = store or self._put
+        self.max_discards = max_discards
+        self.discard_backoff = discard_backoff
+        self.stats: Dict[str, Dict[str, int]] = {
+            category: {"hits": 0, "misses": 0, "generated": 0, "discarded": 0, "errors": 0}
+            for category in self.categories
+        }
+        # Monotonic time at which a category first dropped below high-water
+        self._below_since: Dict[str, Optional[float]] = {c: None for c in self.categories}
+        self._last_refill_lag: Dict[str, Optional[float]] = {c: None for c in self.categories}
+        # Consecutive discarded images and the monotonic time refills resume
+        self._discard_streak: Dict[str, int] = {c: 0 for c in self.categories}
+        self._paused_until: Dict[str, float] = {c: 0.0 for c in self.categories}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _put(self, image: GeneratedImage, category: str) -> dict:
+        return {"image_hash": await self.blob_store.put(image.data), "generator": image.generator, "seed": image.seed}
+
+    async def take(self, category: str) -> Optional[dict]:
+        """Pop the oldest pooled image for `category`, or None on a miss."""
+        doc = await self.collection.find_one_and_delete(
+            {"category": category},
+            projection={"_id": 0},
+            sort=[("created_at", 1)],
+        )
+        if category in self.stats:
+            self.stats[category]["hits" if doc else "misses"] += 1
+            if self._below_since[category] is None:
+                self._below_since[category] = time.monotonic()
+            if self._wakeup is not None:
+                self._wakeup.set()
+        return doc
+
+    async def depth(self, category: str) -> int:
+        return await self.collection.count_documents({"category": category})
+
+    async def _acquire(self, category: str) -> bool:
+        """Take or extend this worker's refill lease on `category`"""
+        if self.leases is None:
+            return True
+        now = datetime.now(timezone.utc)
+        try:
+            await self.leases.find_one_and_update(
+                {"category": category, "$or": [{"owner": self.owner}, {"lease_until": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "lease_until": now + timedelta(seconds=self.lease)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False  # Another worker holds a live lease
+        return True
+
+    async def _release(self, category: str):
+        if self.leases is not None:
+            await self.leases.update_one(
+                {"category": category, "owner": self.owner},
+                {"$set": {"lease_until": datetime.now(timezone.utc)}}
+            )
+
+    async def refill_once(self):
+        """Top up every category this worker can lease to the high-water mark."""
+        for category in self.categories:
+            if time.monotonic() < self._paused_until[category]:
+                continue
+            if not await self._acquire(category):
+                continue
+            try:
+                await self._refill(category)
+            finally:
+                await self._release(category)
+
+    async def _refill(self, category: str):
+        missing = self.high_water - await self.depth(category)
+        if missing > 0 and self._below_since[category] is None:
+            self._below_since[category] = time.monotonic()
+
+        discarded = 0
+        for attempt in range(max(0, missing)):
+            # Extend the lease to cover the next generation
+            if attempt and not await self._acquire(category):
+                logger.warning(f"Image pool refill lease for {category} was taken over")
+                break
+            try:
+                image = await self.generate(category)
+            except Exception as e:
+                self.stats[category]["errors"] += 1
+                logger.warning(f"Image pool refill failed for {category}: {e}")
+                break
+            fields = await self.store(image, category)
+            if fields is None:
+                discarded += 1
+                self._discard_streak[category] += 1
+                if self._discard_streak[category] >= self.max_discards:
+                    self.stats[category]["discarded"] += discarded
+                    self._discard_streak[category] = 0
+                    self._paused_until[category] = time.monotonic() + self.discard_backoff
+                    logger.warning(f"Image pool refill for {category} paused after {self.max_discards} discarded images")
+                    break
+                continue
+            self._discard_streak[category] = 0
+            await self.collection.insert_one({
+                "id": str(uuid.uuid4()),
+                "category": category,
+                **fields,
+                "created_at": datetime.now(timezone.utc),
+            })
+            self.stats[category]["generated"] += 1
+        else:
+            self.stats[category]["discarded"] += discarded
+            below_since = self._below_since[category]
+            # Still short if images were discarded; the next pass retries
+            if below_since is not None and not discarded:
+                self._last_refill_lag[category] = time.monotonic() - below_since
+                self._below_since[category] = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.refill_once()
+            except Exception as e:
+                logger.exception(f"Image pool refill loop error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def report(self) -> dict:
+        """Per-category depth, hit/miss counts and refill lag."""
+        now = time.monotonic()
+        report = {}
+        for category in self.categories:
+            stats = self.stats[category]
+            lookups = stats["hits"] + stats["misses"]
+            below_since = self._below_since[category]
+            report[category] = {
+                "depth": await self.depth(category),
+                "high_water": self.high_water,
+                **stats,
+                "hit_rate": stats["hits"] / lookups if lookups else None,
+                # Time the category has currently been below high-water
+                "refill_lag_seconds": now - below_since if below_since is not None else 0.0,
+                "last_refill_lag_seconds": self._last_refill_lag[category],
+            }
+        return report
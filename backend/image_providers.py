@@ -0,0 +1,145 @@
+"""Image generation backends, selected by the IMAGE_PROVIDER setting."""
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, NamedTuple, Optional
+
+import procedural
+
+logger = logging.getLogger(__name__)
+
+
+class ImageGenerationError(RuntimeError):
+    pass
+
+
+class GeneratedImage(NamedTuple):
+    data: bytes
+    generator: str  # Name of the provider that made it
+    seed: Optional[int] = None  # Set when the image can be re-rendered from it
+
+
+class ImageProvider:
+    """Turns a category prompt into an encoded image."""
+
+    name = ""
+
+    async def generate(self, category: str, prompt: str) -> GeneratedImage:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+    def report(self) -> dict:
+        return {"provider": self.name}
+
+
+class OpenAIImageProvider(ImageProvider):
+    """gpt-image-1 through the Emergent integrations SDK.
+
+    The SDK is imported and the client built on the first generation, so
+    neither the import cost nor EMERGENT_LLM_KEY is needed to start the app.
+    """
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-image-1"):
+        self.api_key = api_key
+        self.model = model
+        self._client = None
+
+    def client(self):
+        if self._client is None:
+            from emergentintegrations.llm.openai.image_generation import OpenAIImageGeneration
+
+            api_key = self.api_key or os.environ.get("EMERGENT_LLM_KEY")
+            if not api_key:
+                raise ImageGenerationError("EMERGENT_LLM_KEY is not set")
+            self._client = OpenAIImageGeneration(api_key=api_key)
+        return self._client
+
+    async def generate(self, category: str, prompt: str) -> GeneratedImage:
+        images = await self.client().generate_images(prompt=prompt, model=self.model, number_of_images=1)
+        if not images:
+            raise ImageGenerationError("Failed to generate image")
+        return GeneratedImage(images[0], self.name)
+
+
+class ProceduralImageProvider(ImageProvider):
+    """Seeded NumPy renderings (see procedural.py); ignores the prompt"""
+
+    name = "procedural"
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+
+    async def render(self, category: str, seed: int) -> bytes:
+        return await asyncio.to_thread(procedural.render, category, seed, self.size)
+
+    async def generate(self, category: str, prompt: str) -> GeneratedImage:
+        seed = procedural.new_seed()
+        return GeneratedImage(await self.render(category, seed), self.name, seed)
+
+
+class FallbackImageProvider(ImageProvider):
+    """Uses `fallback` whenever `primary` fails or takes longer than `timeout` seconds"""
+
+    def __init__(self, primary: ImageProvider, fallback: ImageProvider, timeout: float):
+        self.primary = primary
+        self.fallback = fallback
+        self.timeout = timeout
+        self.name = primary.name
+        self.stats = {"primary": 0, "timeouts": 0, "errors": 0}
+
+    async def generate(self, category: str, prompt: str) -> GeneratedImage:
+        try:
+            image = await asyncio.wait_for(self.primary.generate(category, prompt), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.warning(f"{self.primary.name} took over {self.timeout}s for {category}; using {self.fallback.name}")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"{self.primary.name} failed for {category}: {e}; using {self.fallback.name}")
+        else:
+            self.stats["primary"] += 1
+            return image
+        return await self.fallback.generate(category, prompt)
+
+    async def aclose(self):
+        await self.primary.aclose()
+        await self.fallback.aclose()
+
+    def report(self) -> dict:
+        return {"provider": self.name, "fallback": self.fallback.name, "timeout": self.timeout, **self.stats}
+
+
+PROVIDERS: Dict[str, Callable[[], ImageProvider]] = {
+    "openai": lambda: OpenAIImageProvider(model=os.environ.get("OPENAI_IMAGE_MODEL", "gpt-image-1")),
+    "procedural": lambda: ProceduralImageProvider(size=int(os.environ.get("PROCEDURAL_IMAGE_SIZE", "1024"))),
+}
+
+
+def _build(name: str, setting: str) -> ImageProvider:
+    factory = PROVIDERS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown {setting}: {name}; choose from {', '.join(PROVIDERS)}")
+    return factory()
+
+
+def create_image_provider(name: Optional[str] = None) -> ImageProvider:
+    """Build the provider named by `name` or IMAGE_PROVIDER (default "openai").
+
+    Unless IMAGE_FALLBACK_PROVIDER is set empty, failures and generations
+    slower than IMAGE_FALLBACK_TIMEOUT seconds are served by that provider
+    (default "procedural") instead.
+    """
+    name = name or os.environ.get("IMAGE_PROVIDER", "openai")
+    provider = _build(name, "IMAGE_PROVIDER")
+    fallback = os.environ.get("IMAGE_FALLBACK_PROVIDER", "procedural")
+    if not fallback or fallback == name:
+        return provider
+    return FallbackImageProvider(
+        provider,
+        _build(fallback, "IMAGE_FALLBACK_PROVIDER"),
+        timeout=float(os.environ.get("IMAGE_FALLBACK_TIMEOUT", "60")),
+    )
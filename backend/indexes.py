@@ -0,0 +1,174 @@
+"""Index declarations for every collection, ensured at startup.
+
+QUERY_SHAPES lists the filters/sorts the endpoints actually issue so that
+backend_index_test.py can explain() each one and flag collection scans.
+Keep both lists in sync when adding queries.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel("user_id", unique=True),
+        IndexModel("email"),
+    ],
+    "user_sessions": [
+        IndexModel("session_token", unique=True),
+        IndexModel("user_id"),
+        # Mongo's TTL monitor removes sessions once expires_at has passed
+        IndexModel("expires_at", expireAfterSeconds=0),
+    ],
+    "user_progress": [
+        # Also makes client-supplied completion ids idempotent
+        IndexModel("id", unique=True),
+        IndexModel([("user_id", ASCENDING), ("completed_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel("puzzle_id"),
+    ],
+    "user_stats": [
+        IndexModel("user_id", unique=True),
+    ],
+    "puzzles": [
+        IndexModel("id", unique=True),
+        IndexModel([("category", ASCENDING), ("difficulty", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("difficulty", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+    "generation_jobs": [
+        IndexModel("id", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)]),
+        # Finished jobs are removed once their retention period has passed
+        IndexModel("expires_at", expireAfterSeconds=0),
+    ],
+    "image_pool": [
+        IndexModel([("category", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+    # One refill lease per category; the unique key makes a contested upsert fail
+    "image_pool_leases": [
+        IndexModel("category", unique=True),
+    ],
+    "image_fingerprints": [
+        IndexModel([("algorithm", ASCENDING), ("image_hash", ASCENDING)], unique=True),
+    ],
+    "image_variants": [
+        IndexModel([("image_hash", ASCENDING), ("variant", ASCENDING), ("format", ASCENDING)], unique=True),
+    ],
+    "puzzle_cuts": [
+        IndexModel([("image_hash", ASCENDING), ("difficulty", ASCENDING)], unique=True),
+    ],
+    "images.files": [
+        # Same index the GridFS driver creates on first upload
+        IndexModel([("filename", ASCENDING), ("uploadDate", ASCENDING)]),
+    ],
+    "leaderboard": [
+        IndexModel("user_id", unique=True),
+        IndexModel([("total_score", DESCENDING)]),
+    ],
+    "category_leaderboard": [
+        IndexModel([("category", ASCENDING), ("user_id", ASCENDING)], unique=True),
+        IndexModel([("category", ASCENDING), ("total_score", DESCENDING)]),
+    ],
+}
+
+# (endpoint/query name, collection, filter, sort)
+QUERY_SHAPES = [
+    ("register_user: email lookup", "users", {"email": "a@example.com"}, None),
+    ("login_user: credentials lookup", "users", {"email": "a@example.com", "password": "x"}, None),
+    ("get_current_user: session lookup", "user_sessions", {"session_token": "t"}, None),
+    ("get_current_user: user lookup", "users", {"user_id": "u"}, None),
+    ("generate_puzzle: pool take", "image_pool", {"category": "animals"}, [("created_at", 1)]),
+    ("image pool: refill lease", "image_pool_leases",
+     {"category": "animals", "$or": [{"owner": "o"}, {"lease_until": {"$lt": datetime(2024, 1, 1)}}]}, None),
+    ("generation jobs: claim", "generation_jobs", {"status": "queued"}, [("created_at", 1)]),
+    ("generation jobs: expired leases", "generation_jobs",
+     {"status": "running", "$or": [{"lease_until": {"$lt": datetime(2024, 1, 1)}}, {"lease_until": {"$exists": False}}]}, None),
+    ("get_generation_job", "generation_jobs", {"id": "j"}, None),
+    ("image dedup: load fingerprints", "image_fingerprints", {"algorithm": "phash"}, None),
+    ("get_puzzle_catalog", "puzzles", {}, [("category", 1), ("difficulty", 1), ("created_at", -1), ("id", -1)]),
+    ("get_puzzle_catalog: category", "puzzles", {"category": "animals", "difficulty": 9},
+     [("category", 1), ("difficulty", 1), ("created_at", -1), ("id", -1)]),
+    ("get_puzzle_catalog: after cursor", "puzzles",
+     {"$and": [{"category": "animals"}, {"$or": [
+         {"category": {"$gt": "animals"}},
+         {"category": "animals", "difficulty": {"$gt": 9}},
+         {"category": "animals", "difficulty": 9, "created_at": {"$lt": datetime(2024, 1, 1)}},
+         {"category": "animals", "difficulty": 9, "created_at": datetime(2024, 1, 1), "id": {"$lt": "p"}},
+     ]}]},
+     [("category", 1), ("difficulty", 1), ("created_at", -1), ("id", -1)]),
+    ("get_puzzles", "puzzles", {}, [("created_at", -1)]),
+    ("get_puzzles: category+difficulty", "puzzles", {"category": "animals", "difficulty": 9}, [("created_at", -1)]),
+    ("get_puzzles: difficulty", "puzzles", {"difficulty": 9}, [("created_at", -1)]),
+    ("get_puzzle / image / pieces", "puzzles", {"id": "p"}, None),
+    ("get_puzzle_pieces: cut cache", "puzzle_cuts", {"image_hash": "h", "difficulty": 9}, None),
+    ("get_puzzle_image: variant", "image_variants", {"image_hash": "h", "variant": "thumb", "format": "webp"}, None),
+    ("blob store: stat", "images.files", {"filename": "h"}, None),
+    ("complete_puzzle: leaderboard row", "leaderboard", {"user_id": "u"}, None),
+    ("complete_puzzle: category row", "category_leaderboard", {"category": "animals", "user_id": "u"}, None),
+    ("get_user_progress", "user_progress", {"user_id": "u"}, [("completed_at", -1), ("id", -1)]),
+    ("get_user_progress: after cursor", "user_progress",
+     {"$and": [{"user_id": "u"}, {"$or": [
+         {"completed_at": {"$lt": datetime(2024, 1, 1)}},
+         {"completed_at": datetime(2024, 1, 1), "id": {"$lt": "p"}},
+     ]}]},
+     [("completed_at", -1), ("id", -1)]),
+    ("complete_puzzles_batch: puzzle categories", "puzzles", {"id": {"$in": ["p", "q"]}}, None),
+    ("get_user_progress_summary: user", "users", {"user_id": "u"}, None),
+    ("get_user_stats", "user_stats", {"user_id": "u"}, None),
+    ("get_global_leaderboard", "leaderboard", {}, [("total_score", -1)]),
+    ("get_category_leaderboard", "category_leaderboard", {"category": "animals"}, [("total_score", -1)]),
+    ("leaderboard rank: entries", "leaderboard", {"user_id": {"$in": ["u", "v"]}}, None),
+    ("leaderboard rank: category entries", "category_leaderboard",
+     {"category": "animals", "user_id": {"$in": ["u", "v"]}}, None),
+    ("leaderboard: new row usernames", "users", {"user_id": {"$in": ["u", "v"]}}, None),
+    ("rebuild-leaderboard: category backfill", "user_progress",
+     {"puzzle_id": "p", "category": {"$exists": False}}, None),
+]
+
+
+async def ensure_indexes(db, collections: Optional[List[str]] = None):
+    """Create any missing indexes
+
+    A failed build is logged and skipped when the collection's indexes only
+    speed up reads, but re-raised when one of them is unique: idempotent
+    completions, refill leases and dedup all rely on those constraints.
+    """
+    for name, models in INDEXES.items():
+        if collections is not None and name not in collections:
+            continue
+        try:
+            await db[name].create_indexes(models)
+        except OperationFailure as e:
+            logger.error(f"Could not ensure indexes on {name}: {e}")
+            if any(model.document.get("unique") for model in models):
+                raise
+
+
+def plan_stages(plan: dict):
+    """Yield every stage name in an explain() plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan", "outerStage", "innerStage"):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+async def explain_query_shapes(db) -> Dict[str, List[str]]:
+    """Map every query shape to the stages of its winning plan"""
+    results = {}
+    for name, collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.limit(50).explain()
+        results[name] = list(plan_stages(explanation["queryPlanner"]["winningPlan"]))
+    return results
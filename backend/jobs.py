@@ -0,0 +1,261 @@
+"""Background puzzle generation jobs persisted in MongoDB."""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class GenerationJobs:
+    """Runs queued jobs on `concurrency` worker tasks.
+
+    Jobs are claimed from `collection` with an atomic queued -> running
+    update, oldest first, so several app processes can share one queue.
+    A claim records this process as the owner with a lease that is renewed
+    while the job runs; jobs whose lease expired because their process
+    died are put back in the queue by whichever process notices first.
+    Finished jobs expire `retention` seconds later through the TTL index
+    on expires_at. Subscribers get every status change made by this
+    process; watchers of jobs run elsewhere fall back to polling.
+    """
+
+    def __init__(
+        self,
+        collection,
+        run: Callable[[dict], Awaitable[dict]],
+        concurrency: int = 4,
+        poll_interval: float = 5.0,
+        retention: float = 24 * 3600,
+        lease: float = 60.0,
+    ):
+        self.collection = collection
+        self.run = run
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = {"submitted": 0, "succeeded": 0, "failed": 0, "requeued": 0, "lost": 0}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def submit(self, params: dict) -> dict:
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": QUEUED,
+            "params": params,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.collection.insert_one(dict(job))
+        self.stats["submitted"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0})
+
+    def _lease_until(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.lease)
+
+    async def _update(self, job_id: str, fields: dict, unset: tuple = ()) -> Optional[dict]:
+        """Update a job this process still owns; None if the lease was lost"""
+        fields["updated_at"] = datetime.now(timezone.utc)
+        update = {"$set": fields}
+        if unset:
+            update["$unset"] = {name: "" for name in unset}
+        job = await self.collection.find_one_and_update(
+            {"id": job_id, "status": RUNNING, "owner": self.owner},
+            update,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is not None:
+            self._publish(job)
+        return job
+
+    async def _claim(self) -> Optional[dict]:
+        job = await self.collection.find_one_and_update(
+            {"status": QUEUED},
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "owner": self.owner,
+                    "lease_until": self._lease_until(),
+                    "updated_at": datetime.now(timezone.utc),
+                },
+                "$inc": {"attempts": 1},
+            },
+            projection={"_id": 0},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is not None:
+            self._publish(job)
+        return job
+
+    async def _renew(self, job_id: str):
+        """Extend the lease of a running job until cancelled"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                result = await self.collection.update_one(
+                    {"id": job_id, "status": RUNNING, "owner": self.owner},
+                    {"$set": {"lease_until": self._lease_until()}}
+                )
+            except Exception as e:
+                logger.warning(f"Could not renew the lease of generation job {job_id}: {e}")
+                continue
+            if result.matched_count == 0:
+                logger.warning(f"Lost the lease of generation job {job_id}")
+                return
+
+    async def _execute(self, job: dict):
+        renewal = asyncio.create_task(self._renew(job["id"]))
+        try:
+            result = await self.run(job["params"])
+        except asyncio.CancelledError:
+            # Shutting down; let the next process pick the job up again
+            renewal.cancel()
+            await self._update(job["id"], {"status": QUEUED}, unset=("owner", "lease_until"))
+            raise
+        except Exception as e:
+            renewal.cancel()
+            logger.warning(f"Generation job {job['id']} failed: {e}")
+            self.stats["failed"] += 1
+            await self._finish(job["id"], {"status": FAILED, "error": str(e)})
+            return
+        renewal.cancel()
+        self.stats["succeeded"] += 1
+        await self._finish(job["id"], {"status": SUCCEEDED, "result": result})
+
+    async def _finish(self, job_id: str, fields: dict):
+        fields["expires_at"] = datetime.now(timezone.utc) + timedelta(seconds=self.retention)
+        if await self._update(job_id, fields, unset=("owner", "lease_until")) is None:
+            # Another process requeued the job after our lease expired
+            self.stats["lost"] += 1
+            logger.warning(f"Generation job {job_id} finished after its lease was lost")
+
+    async def _work(self):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.exception(f"Could not claim a generation job: {e}")
+                job = None
+            if job is not None:
+                try:
+                    await self._execute(job)
+                except Exception as e:
+                    logger.exception(f"Generation job {job['id']} could not be saved: {e}")
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def requeue_interrupted(self) -> int:
+        """Put running jobs whose lease expired back in the queue"""
+        now = datetime.now(timezone.utc)
+        result = await self.collection.update_many(
+            # Jobs claimed before leases existed have no lease_until at all
+            {"status": RUNNING, "$or": [{"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}]},
+            {"$set": {"status": QUEUED, "updated_at": now}, "$unset": {"owner": "", "lease_until": ""}}
+        )
+        self.stats["requeued"] += result.modified_count
+        if result.modified_count and self._wakeup is not None:
+            self._wakeup.set()
+        return result.modified_count
+
+    async def _reap(self):
+        while True:
+            try:
+                requeued = await self.requeue_interrupted()
+                if requeued:
+                    logger.info(f"Requeued {requeued} interrupted generation jobs")
+            except Exception as e:
+                logger.warning(f"Could not requeue interrupted generation jobs: {e}")
+            await asyncio.sleep(self.lease)
+
+    async def start(self):
+        if self._workers:
+            return
+        self._wakeup = asyncio.Event()
+        self._reaper = asyncio.create_task(self._reap())
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        tasks = self._workers + ([self._reaper] if self._reaper else [])
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        self._reaper = None
+
+    def _publish(self, job: dict):
+        for queue in self._subscribers.get(job["id"], ()):
+            queue.put_nowait(job)
+
+    async def watch(self, job_id: str, heartbeat: float = 15.0):
+        """Yield the job now and after every status change until it finishes.
+
+        Yields None when nothing changed for `heartbeat` seconds so callers
+        can keep the connection alive.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            yield job
+            while job["status"] not in FINISHED:
+                try:
+                    changed = await asyncio.wait_for(queue.get(), timeout=min(heartbeat, self.poll_interval))
+                except asyncio.TimeoutError:
+                    # The job may be running in another process
+                    changed = await self.get(job_id)
+                    if changed is None:
+                        return
+                    if changed["status"] == job["status"]:
+                        yield None
+                        continue
+                if changed != job:
+                    job = changed
+                    yield job
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+    async def report(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "concurrency": self.concurrency,
+            "queued": await self.collection.count_documents({"status": QUEUED}),
+            "running": await self.collection.count_documents({"status": RUNNING}),
+            **self.stats,
+        }
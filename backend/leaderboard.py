@@ -0,0 +1,149 @@
+"""Leaderboard totals maintained incrementally by complete_puzzle."""
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import DESCENDING, UpdateOne
+
+from indexes import ensure_indexes
+
+
+def leaderboard_entry(row: dict) -> dict:
+    """Shape a leaderboard row like LeaderboardEntry with an exact average_time"""
+    completed = row.get("puzzles_completed", 0)
+    return {
+        "user_id": row["user_id"],
+        "username": row.get("username") or "",
+        "total_score": row.get("total_score", 0),
+        "puzzles_completed": completed,
+        "average_time": row.get("total_time", 0) / completed if completed else 0.0,
+    }
+
+
+class LeaderboardStore:
+    """Running score, count and time sums per user.
+
+    `leaderboard` holds one document per user and `category_leaderboard` one
+    per (category, user), so both boards are indexed top-N reads.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.board = db.leaderboard
+        self.category_board = db.category_leaderboard
+
+    async def _increment(self, collection, increments: Dict[Tuple, dict], key_fields: Tuple[str, ...]):
+        if not increments:
+            return
+        keys = [dict(zip(key_fields, key)) for key in increments]
+        result = await collection.bulk_write(
+            [UpdateOne(key, {"$inc": inc}, upsert=True) for key, inc in zip(keys, increments.values())],
+            ordered=False
+        )
+        if result.upserted_ids:
+            # First completion on this board: copy the display names over
+            new_keys = [keys[i] for i in result.upserted_ids]
+            cursor = self.db.users.find(
+                {"user_id": {"$in": [key["user_id"] for key in new_keys]}},
+                {"_id": 0, "user_id": 1, "username": 1}
+            )
+            usernames = {user["user_id"]: user["username"] async for user in cursor}
+            updates = [
+                UpdateOne(key, {"$set": {"username": usernames[key["user_id"]]}})
+                for key in new_keys if key["user_id"] in usernames
+            ]
+            if updates:
+                await collection.bulk_write(updates, ordered=False)
+
+    async def record_many(self, progress: List[dict]):
+        """Fold progress rows (user_id, category, score, time_taken) into both boards"""
+        def totals():
+            return {"total_score": 0, "puzzles_completed": 0, "total_time": 0}
+
+        board = defaultdict(totals)
+        category_board = defaultdict(totals)
+        for row in progress:
+            targets = [board[(row["user_id"],)]]
+            if row.get("category"):
+                targets.append(category_board[(row["category"], row["user_id"])])
+            for inc in targets:
+                inc["total_score"] += row["score"]
+                inc["puzzles_completed"] += 1
+                inc["total_time"] += row["time_taken"]
+
+        await self._increment(self.board, board, ("user_id",))
+        await self._increment(self.category_board, category_board, ("category", "user_id"))
+
+    async def record(self, user_id: str, score: int, time_taken: int, category: Optional[str] = None):
+        await self.record_many([{"user_id": user_id, "category": category, "score": score, "time_taken": time_taken}])
+
+    async def set_username(self, user_id: str, username: str):
+        await self.board.update_one({"user_id": user_id}, {"$set": {"username": username}})
+        await self.category_board.update_many({"user_id": user_id}, {"$set": {"username": username}})
+
+    async def top(self, limit: int) -> List[dict]:
+        cursor = self.board.find({}, {"_id": 0}).sort("total_score", DESCENDING).limit(limit)
+        return [leaderboard_entry(row) async for row in cursor]
+
+    async def top_category(self, category: str, limit: int) -> List[dict]:
+        cursor = self.category_board.find({"category": category}, {"_id": 0}).sort("total_score", DESCENDING).limit(limit)
+        return [leaderboard_entry(row) async for row in cursor]
+
+    async def entries(self, user_ids: List[str], category: Optional[str] = None) -> dict:
+        """Leaderboard entries for `user_ids`, keyed by user_id"""
+        if category is None:
+            cursor = self.board.find({"user_id": {"$in": user_ids}}, {"_id": 0})
+        else:
+            cursor = self.category_board.find({"category": category, "user_id": {"$in": user_ids}}, {"_id": 0})
+        return {row["user_id"]: leaderboard_entry(row) async for row in cursor}
+
+    async def backfill_progress_categories(self) -> int:
+        """Copy the puzzle category onto progress rows recorded before it was denormalized"""
+        updated = 0
+        puzzle_ids = await self.db.user_progress.distinct("puzzle_id", {"category": {"$exists": False}})
+        async for puzzle in self.db.puzzles.find({"id": {"$in": puzzle_ids}}, {"_id": 0, "id": 1, "category": 1}):
+            result = await self.db.user_progress.update_many(
+                {"puzzle_id": puzzle["id"], "category": {"$exists": False}},
+                {"$set": {"category": puzzle["category"]}}
+            )
+            updated += result.modified_count
+        return updated
+
+    def _rollup_pipeline(self, group_id, project: dict, target: str) -> list:
+        return [
+            {"$group": {
+                "_id": group_id,
+                "total_score": {"$sum": "$score"},
+                "puzzles_completed": {"$sum": 1},
+                "total_time": {"$sum": "$time_taken"},
+            }},
+            {"$project": {"_id": 0, **project, "total_score": 1, "puzzles_completed": 1, "total_time": 1}},
+            {"$lookup": {
+                "from": "users",
+                "localField": "user_id",
+                "foreignField": "user_id",
+                "as": "user",
+            }},
+            {"$addFields": {"username": {"$arrayElemAt": ["$user.username", 0]}}},
+            {"$project": {"user": 0}},
+            {"$out": target},
+        ]
+
+    async def rebuild(self):
+        """Recompute both boards from user_progress and atomically replace them.
+
+        Completions recorded while the rebuild runs may be lost, so run it
+        during a quiet period.
+        """
+        await self.backfill_progress_categories()
+        await self.db.user_progress.aggregate(
+            self._rollup_pipeline("$user_id", {"user_id": "$_id"}, "leaderboard")
+        ).to_list(None)
+        await self.db.user_progress.aggregate(
+            [{"$match": {"category": {"$type": "string"}}}]
+            + self._rollup_pipeline(
+                {"category": "$category", "user_id": "$user_id"},
+                {"category": "$_id.category", "user_id": "$_id.user_id"},
+                "category_leaderboard",
+            )
+        ).to_list(None)
+        await ensure_indexes(self.db, ["leaderboard", "category_leaderboard"])
@@ -0,0 +1,123 @@
+"""Maintenance commands, run from the backend directory: python manage.py --help"""
+import asyncio
+import base64
+import os
+from pathlib import Path
+
+import typer
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from blob_store import create_blob_store
+from dedup import ImageDeduplicator
+from indexes import ensure_indexes
+from leaderboard import LeaderboardStore
+from user_stats import UserStatsStore
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+cli = typer.Typer(help="JigsawMaster backend maintenance commands")
+
+
+def get_db():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    return client, client[os.environ['DB_NAME']]
+
+
+async def _migrate_images(dry_run: bool):
+    client, db = get_db()
+    blob_store = create_blob_store(db)
+    try:
+        for collection in (db.puzzles, db.image_pool):
+            migrated = 0
+            cursor = collection.find(
+                {"image_base64": {"$type": "string"}},
+                {"_id": 1, "image_base64": 1}
+            )
+            async for doc in cursor:
+                if not dry_run:
+                    image_hash = await blob_store.put(base64.b64decode(doc["image_base64"]))
+                    await collection.update_one(
+                        {"_id": doc["_id"]},
+                        {"$set": {"image_hash": image_hash}, "$unset": {"image_base64": ""}}
+                    )
+                migrated += 1
+            typer.echo(f"{collection.name}: {migrated} documents {'to migrate' if dry_run else 'migrated'}")
+    finally:
+        client.close()
+
+
+@cli.command("migrate-images")
+def migrate_images(dry_run: bool = typer.Option(False, help="Only count documents that still embed images")):
+    """Move inline image_base64 payloads into the blob store (safe to re-run)."""
+    asyncio.run(_migrate_images(dry_run))
+
+
+async def _rebuild_leaderboard():
+    client, db = get_db()
+    try:
+        await LeaderboardStore(db).rebuild()
+        typer.echo(f"leaderboard: {await db.leaderboard.count_documents({})} users")
+        typer.echo(f"category_leaderboard: {await db.category_leaderboard.count_documents({})} rows")
+    finally:
+        client.close()
+
+
+@cli.command("rebuild-leaderboard")
+def rebuild_leaderboard():
+    """Backfill the global and per-category leaderboards from user_progress."""
+    asyncio.run(_rebuild_leaderboard())
+
+
+async def _rebuild_user_stats():
+    client, db = get_db()
+    try:
+        await LeaderboardStore(db).backfill_progress_categories()
+        rows = await UserStatsStore(db).rebuild()
+        await ensure_indexes(db, ["user_stats"])
+        typer.echo(f"user_stats: {await db.user_stats.count_documents({})} users from {rows} progress rows")
+    finally:
+        client.close()
+
+
+@cli.command("rebuild-user-stats")
+def rebuild_user_stats():
+    """Backfill the per-user difficulty and category stats from user_progress."""
+    asyncio.run(_rebuild_user_stats())
+
+
+async def _fingerprint_images(algorithm: str):
+    client, db = get_db()
+    blob_store = create_blob_store(db)
+    dedup = ImageDeduplicator(db.image_fingerprints, blob_store, algorithm=algorithm)
+    try:
+        await ensure_indexes(db, ["image_fingerprints"])
+        done = set(await db.image_fingerprints.distinct("image_hash", {"algorithm": algorithm}))
+        added = failed = 0
+        for collection in (db.puzzles, db.image_pool):
+            async for doc in collection.find({"image_hash": {"$type": "string"}}, {"_id": 0, "image_hash": 1, "category": 1}):
+                if doc["image_hash"] in done:
+                    continue
+                done.add(doc["image_hash"])
+                try:
+                    fingerprint = await dedup.fingerprint(await blob_store.read(doc["image_hash"]))
+                except Exception as e:
+                    failed += 1
+                    typer.echo(f"{doc['image_hash']}: {e}", err=True)
+                    continue
+                await dedup.register(doc["image_hash"], fingerprint, doc.get("category"))
+                added += 1
+        typer.echo(f"image_fingerprints: {added} added, {failed} failed")
+    finally:
+        client.close()
+
+
+@cli.command("fingerprint-images")
+def fingerprint_images(algorithm: str = typer.Option("phash", help="Perceptual hash: phash or dhash")):
+    """Fingerprint stored images so dedup also matches images generated before it (safe to re-run)."""
+    asyncio.run(_fingerprint_images(algorithm))
+
+
+if __name__ == "__main__":
+    cli()
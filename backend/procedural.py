@@ -0,0 +1,321 @@
+"""Local, seeded puzzle images rendered with NumPy.
+
+A 1024px JPEG takes roughly 70-250 ms depending on the style and machine.
+
+Each category has a style: layered fBm mountain ranges for nature, Voronoi
+coat patterns for animals, citrus slices for food, Truchet tiles for
+objects, a road at sunset for vehicles and a lit skyline for buildings;
+anything else gets domain-warped marble. `render(category, seed)` is a pure
+function of its arguments, so a puzzle can be recreated from its seed.
+Rendered images are still stored in the blob store like any other; the
+seed only lets GET /puzzles/{id}/image repair a puzzle whose blob is gone.
+Changing a renderer changes every image it made; treat them as frozen.
+"""
+import io
+import secrets
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Seeds stay below 2**53 so they survive JSON clients that use doubles
+MAX_SEED = 2 ** 53
+
+Palette = Sequence[Tuple[int, int, int]]
+
+PALETTES: Dict[str, List[Palette]] = {
+    "nature": [
+        [(255, 214, 170), (250, 160, 110), (120, 100, 150), (40, 50, 90)],
+        [(200, 230, 255), (120, 170, 220), (70, 110, 90), (30, 60, 40)],
+        [(255, 240, 200), (240, 180, 90), (150, 90, 70), (60, 40, 50)],
+    ],
+    "animals": [
+        [(235, 200, 140), (200, 140, 70), (120, 70, 30), (40, 25, 15)],
+        [(240, 240, 230), (180, 170, 150), (90, 80, 70), (20, 20, 20)],
+        [(250, 220, 120), (220, 150, 40), (140, 80, 20), (50, 30, 10)],
+    ],
+    "food": [
+        [(255, 220, 60), (250, 170, 40), (240, 110, 40), (255, 250, 235)],
+        [(170, 220, 60), (110, 180, 50), (240, 250, 200), (255, 255, 240)],
+        [(255, 130, 110), (230, 60, 70), (255, 200, 170), (255, 250, 240)],
+    ],
+    "objects": [
+        [(240, 90, 80), (250, 200, 90), (60, 170, 160), (40, 60, 90)],
+        [(90, 60, 150), (230, 120, 170), (250, 220, 150), (60, 180, 200)],
+        [(30, 40, 50), (220, 220, 210), (230, 100, 50), (70, 130, 180)],
+    ],
+    "vehicles": [
+        [(20, 10, 50), (120, 30, 120), (250, 90, 120), (255, 200, 80)],
+        [(10, 30, 60), (40, 90, 160), (250, 140, 60), (255, 230, 150)],
+    ],
+    "buildings": [
+        [(10, 15, 40), (40, 50, 100), (230, 120, 90), (255, 210, 120)],
+        [(20, 30, 60), (70, 90, 140), (180, 190, 220), (255, 240, 180)],
+    ],
+    "other": [
+        [(20, 40, 80), (60, 130, 180), (230, 240, 245), (200, 160, 90)],
+        [(60, 20, 40), (170, 50, 70), (240, 190, 150), (250, 245, 235)],
+        [(20, 50, 40), (60, 140, 110), (220, 230, 190), (240, 180, 80)],
+    ],
+}
+
+
+def new_seed() -> int:
+    return secrets.randbelow(MAX_SEED)
+
+
+def _smoothstep(t: np.ndarray) -> np.ndarray:
+    return t * t * (3 - 2 * t)
+
+
+def _value_noise(rng: np.random.Generator, size: int, cells: int) -> np.ndarray:
+    """Smoothly interpolated random lattice with `cells` cells per side"""
+    lattice = rng.random((cells + 1, cells + 1), dtype=np.float32)
+    coords = np.arange(size, dtype=np.float32) * (cells / size)
+    i = coords.astype(np.intp)
+    f = _smoothstep(coords - i)
+    # Separable: interpolate the small lattice along x, then expand rows along y
+    rows = lattice[:, i] * (1 - f) + lattice[:, i + 1] * f
+    return rows[i] * (1 - f)[:, None] + rows[i + 1] * f[:, None]
+
+
+def fbm(rng: np.random.Generator, size: int, octaves: int = 5, cells: int = 4, gain: float = 0.5) -> np.ndarray:
+    """Fractal Brownian motion: octaves of value noise, normalized to [0, 1]"""
+    total = np.zeros((size, size), dtype=np.float32)
+    amplitude = 1.0
+    for octave in range(octaves):
+        total += amplitude * _value_noise(rng, size, min(cells << octave, size - 1))
+        amplitude *= gain
+    total -= total.min()
+    return total / max(total.max(), 1e-9)
+
+
+def fbm_1d(rng: np.random.Generator, size: int, octaves: int = 6, cells: int = 3) -> np.ndarray:
+    total = np.zeros(size, dtype=np.float32)
+    amplitude = 1.0
+    for octave in range(octaves):
+        n = min(cells << octave, size - 1)
+        points = rng.random(n + 1, dtype=np.float32)
+        coords = np.arange(size, dtype=np.float32) * (n / size)
+        i = coords.astype(np.intp)
+        f = _smoothstep(coords - i)
+        total += amplitude * (points[i] * (1 - f) + points[i + 1] * f)
+        amplitude *= 0.5
+    total -= total.min()
+    return total / max(total.max(), 1e-9)
+
+
+def gradient_map(values: np.ndarray, palette: Palette) -> np.ndarray:
+    """Map values in [0, 1] through evenly spaced palette stops to RGB"""
+    stops = np.linspace(0, 1, len(palette))
+    colors = np.asarray(palette, dtype=np.float32)
+    return np.stack([np.interp(values, stops, colors[:, c]).astype(np.float32) for c in range(3)], axis=-1)
+
+
+def _mix(a, b, t):
+    t = np.asarray(t, dtype=np.float32)
+    if t.ndim == 2:
+        t = t[..., None]
+    return a * (1 - t) + np.asarray(b, dtype=np.float32) * t
+
+
+def _grid(size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Pixel-centre coordinates in [0, 1): (y column, x row) for broadcasting"""
+    axis = (np.arange(size, dtype=np.float32) + 0.5) / size
+    return axis[:, None], axis[None, :]
+
+
+def landscape(rng: np.random.Generator, size: int, palette: Palette) -> np.ndarray:
+    y, x = _grid(size)
+    sky_top, sky_low, far, near = (np.asarray(c, dtype=np.float32) for c in palette)
+    image = _mix(sky_low, sky_top, np.broadcast_to((1 - y) ** 1.5, (size, size)))
+    clouds = fbm(rng, size, octaves=5, cells=3)
+    image = _mix(image, (255, 255, 255), np.clip(clouds - 0.55, 0, 1) * 1.2 * (y < 0.55))
+
+    layers = int(rng.integers(3, 6))
+    texture = fbm(rng, size, octaves=5, cells=8)
+    for k in range(layers):
+        depth = k / (layers - 1)
+        base = 0.35 + 0.45 * depth
+        ridge = base - (0.28 - 0.12 * depth) * fbm_1d(rng, size, cells=int(rng.integers(2, 5)))
+        # Far ranges fade into the sky, near ones pick up texture
+        color = _mix(_mix(sky_low, far, 0.55), near, depth)
+        mask = y > ridge[None, :]
+        shade = 0.75 + 0.25 * texture + 0.15 * (y - ridge[None, :])
+        image = np.where(mask[..., None], color * shade[..., None] * (0.8 + 0.2 * depth), image)
+
+    # Lake in the foreground mirrors the sky
+    shore = 0.88 + 0.04 * fbm_1d(rng, size, cells=4)
+    water = np.flipud(image) * 0.6 + sky_top * 0.25
+    ripple = 0.9 + 0.1 * np.sin(y * 300 + texture * 8)
+    return np.where((y > shore[None, :])[..., None], water * ripple[..., None], image)
+
+
+def voronoi(rng: np.random.Generator, size: int, palette: Palette) -> np.ndarray:
+    """Giraffe/leopard-like coat: cells coloured from the palette, dark seams"""
+    count = int(rng.integers(40, 90))
+    points = rng.random((count, 2)).astype(np.float32)
+    y, x = _grid(size)
+    nearest = np.full((size, size), np.inf, dtype=np.float32)
+    second = np.full((size, size), np.inf, dtype=np.float32)
+    owner = np.zeros((size, size), dtype=np.intp)
+    for index, (py, px) in enumerate(points):
+        distance = (y - py) ** 2 + (x - px) ** 2
+        closer = distance < nearest
+        second = np.where(closer, nearest, np.minimum(second, distance))
+        owner = np.where(closer, index, owner)
+        nearest = np.where(closer, distance, nearest)
+    seam = np.sqrt(second) - np.sqrt(nearest)
+    tones = rng.random(count) * 0.6
+    cells = gradient_map(tones[owner] + 0.3 * fbm(rng, size, octaves=4, cells=6), palette[:3])
+    border = np.clip(seam * size / 6, 0, 1)[..., None]
+    return cells * border + np.asarray(palette[3], dtype=np.float32) * (1 - border)
+
+
+def citrus(rng: np.random.Generator, size: int, palette: Palette) -> np.ndarray:
+    """Citrus slices on a gingham tablecloth"""
+    y, x = _grid(size)
+    rind, pith = np.asarray(palette[1], dtype=np.float32), np.asarray(palette[2], dtype=np.float32)
+    checks = ((np.floor(y * 12) + np.floor(x * 12)) % 2).astype(np.float64)
+    cloth = _mix(np.broadcast_to(np.asarray(palette[3], dtype=np.float32), (size, size, 3)),
+                 (200, 70, 70) if rng.random() < 0.5 else (70, 110, 200), 0.25 + 0.35 * checks)
+    image = cloth * (0.9 + 0.1 * fbm(rng, size, octaves=3, cells=16))[..., None]
+    pulp = _mix(rind, palette[0], fbm(rng, size, octaves=4, cells=24))
+    for _ in range(int(rng.integers(3, 7))):
+        cy, cx = rng.random(2)
+        radius = rng.uniform(0.12, 0.28)
+        segments = int(rng.integers(7, 12))
+        turn = rng.random() * np.pi
+        # Only the slice's bounding box (plus its shadow) is touched
+        top, bottom = (int(np.clip(v * size, 0, size)) for v in (cy - radius * 1.2, cy + radius * 1.2))
+        left, right = (int(np.clip(v * size, 0, size)) for v in (cx - radius * 1.2, cx + radius * 1.2))
+        if top >= bottom or left >= right:
+            continue
+        box = (slice(top, bottom), slice(left, right))
+        dy, dx = y[top:bottom] - cy, x[:, left:right] - cx
+        r = np.sqrt(dy ** 2 + dx ** 2) / radius
+        theta = np.arctan2(dy, dx) + turn
+        membrane = np.abs(np.sin(theta * segments / 2)) < 0.06 + 0.05 / np.maximum(r * 8, 0.2)
+        slice_image = np.where((membrane | (r < 0.08))[..., None], pith, pulp[box])
+        slice_image = np.where((r >= 0.86)[..., None], pith, slice_image)
+        slice_image = np.where((r >= 0.93)[..., None], rind * 0.85, slice_image)
+        # Soft drop shadow, then the slice itself
+        shadow = np.clip(1.1 - np.sqrt((dy - 0.01) ** 2 + (dx - 0.015) ** 2) / radius, 0, 1)
+        region = image[box] * (1 - 0.35 * shadow[..., None])
+        image[box] = np.where((r < 1)[..., None], slice_image, region)
+    return image
+
+
+def truchet(rng: np.random.Generator, size: int, palette: Palette) -> np.ndarray:
+    """Quarter-circle Truchet tiles, two-coloured by the regions they enclose"""
+    tiles = int(rng.integers(6, 14))
+    y, x = _grid(size)
+    ty, tx = np.floor(y * tiles).astype(np.intp), np.floor(x * tiles).astype(np.intp)
+    fy, fx = y * tiles - ty, x * tiles - tx
+    flips = rng.random((tiles, tiles)) < 0.5
+    flipped = flips[ty, tx]
+    fx = np.where(flipped, 1 - fx, np.broadcast_to(fx, (size, size)))
+    fy = np.broadcast_to(fy, (size, size))
+    to_origin = np.sqrt(fx ** 2 + fy ** 2)
+    to_corner = np.sqrt((1 - fx) ** 2 + (1 - fy) ** 2)
+    arc = np.minimum(np.abs(to_origin - 0.5), np.abs(to_corner - 0.5))
+    # Regions alternate like a checkerboard, flipping with the tile orientation
+    side = (to_origin < 0.5) | (to_corner < 0.5)
+    parity = ((ty + tx) % 2).astype(bool) ^ flipped ^ side
+    width = rng.uniform(0.07, 0.14)
+    background = np.where(parity[..., None], np.asarray(palette[0], dtype=np.float32), np.asarray(palette[1], dtype=np.float32))
+    background = background * (0.85 + 0.15 * fbm(rng, size, octaves=4, cells=6))[..., None]
+    band = gradient_map(fbm(rng, size, octaves=3, cells=4), palette[2:])
+    edge = np.clip((width - arc) * size / tiles, 0, 1)[..., None]
+    return background * (1 - edge) + band * edge
+
+
+def road(rng: np.random.Generator, size: int, palette: Palette) -> np.ndarray:
+    """Retro road to a striped sun over a perspective grid"""
+    y, x = _grid(size)
+    horizon = rng.uniform(0.5, 0.6)
+    sky = gradient_map(np.broadcast_to(y / horizon, (size, size)).clip(0, 1), palette)
+    sun_x, sun_r = rng.uniform(0.3, 0.7), rng.uniform(0.15, 0.25)
+    sun_y = horizon - sun_r * 0.4
+    in_sun = (y - sun_y) ** 2 + (x - sun_x) ** 2 < sun_r ** 2
+    stripes = (np.sin((y - sun_y) * 90) > (y - sun_y) / sun_r * 2)
+    sun = gradient_map(np.broadcast_to(((y - sun_y + sun_r) / (2 * sun_r)).clip(0, 1), (size, size)), [palette[3], palette[2]])
+    image = np.where((in_sun & stripes)[..., None], sun, sky)
+
+    ridge = horizon - 0.12 * fbm_1d(rng, size, cells=5)
+    image = np.where((y > ridge[None, :])[..., None] & (y <= horizon), np.asarray(palette[0], dtype=np.float32) * 1.4, image)
+
+    ground = y > horizon
+    depth = np.where(ground, 1 / np.maximum(y - horizon, 1e-3), 0)
+    spread = (x - 0.5) * np.where(ground, 1 / np.maximum(y - horizon, 1e-3), 0)
+    lines = (np.abs((depth * 0.3) % 1 - 0.5) > 0.47) | (np.abs((spread * 0.25) % 1 - 0.5) > 0.47)
+    floor = np.where(lines[..., None], np.asarray(palette[2], dtype=np.float32), np.asarray(palette[0], dtype=np.float32))
+    asphalt = np.abs(x - 0.5) < (y - horizon) * 0.9
+    dashes = (np.abs(x - 0.5) < (y - horizon) * 0.03) & ((depth * 0.8) % 1 < 0.5)
+    floor = np.where(asphalt[..., None], np.asarray((45, 45, 55), dtype=np.float32), floor)
+    floor = np.where((asphalt & dashes)[..., None], np.asarray(palette[3], dtype=np.float32), floor)
+    return np.where(ground[..., None], floor, image)
+
+
+def skyline(rng: np.random.Generator, size: int, palette: Palette) -> np.ndarray:
+    """Two rows of towers with lit windows against a dusk sky"""
+    y, x = _grid(size)
+    image = gradient_map(np.broadcast_to(y, (size, size)), [palette[0], palette[1], palette[2]])
+    stars = (rng.random((size, size)) > 0.998) & (y < 0.4)
+    image = np.where(stars[..., None], 255.0, image)
+    column = np.arange(size)
+    for row, (low, high, shade) in enumerate(((0.25, 0.55, 0.55), (0.4, 0.8, 0.3))):
+        tops = np.ones(size)
+        left = 0
+        while left < size:
+            # At least one column, or tiny work sizes never reach the edge
+            width = max(1, int(rng.integers(size // 24, size // 9)))
+            tops[left:left + width] = rng.uniform(low, high)
+            left += width + int(rng.integers(0, size // 60 + 1))
+        body = y > tops[None, :]
+        wall = np.asarray(palette[0], dtype=np.float32) * (1 + shade)
+        window_rows = (np.floor(y * size / 14) % 2 == 1)
+        window_cols = (column % 12 > 3)[None, :]
+        lit = rng.random((size // 14 + 1, size // 12 + 1)) < (0.35 + 0.2 * row)
+        window_lit = lit[np.floor(y * size / 28).astype(np.intp), column[None, :] // 12]
+        windows = body & window_rows & window_cols & window_lit & (y > tops[None, :] + 0.02)
+        image = np.where(body[..., None], wall, image)
+        image = np.where(windows[..., None], np.asarray(palette[3], dtype=np.float32), image)
+    return image
+
+
+def marble(rng: np.random.Generator, size: int, palette: Palette) -> np.ndarray:
+    y, x = _grid(size)
+    warp = fbm(rng, size, octaves=6, cells=3)
+    veins = np.sin((x * rng.uniform(3, 8) + y * rng.uniform(1, 4) + warp * rng.uniform(4, 9)) * np.pi)
+    return gradient_map((veins + 1) / 2, palette)
+
+
+STYLES: Dict[str, Callable[[np.random.Generator, int, Palette], np.ndarray]] = {
+    "nature": landscape,
+    "animals": voronoi,
+    "food": citrus,
+    "objects": truchet,
+    "vehicles": road,
+    "buildings": skyline,
+}
+
+
+def render_pixels(category: str, seed: int, size: int = 1024) -> np.ndarray:
+    """RGB uint8 array for (category, seed); identical inputs give identical pixels"""
+    rng = np.random.default_rng(seed)
+    palettes = PALETTES.get(category, PALETTES["other"])
+    palette = palettes[int(rng.integers(len(palettes)))]
+    # Styles are drawn at half resolution and upscaled: a quarter of the work
+    work = STYLES.get(category, marble)(rng, max(size // 2, 16), palette)
+    image = Image.fromarray(np.clip(work, 0, 255).astype(np.uint8)).resize((size, size), Image.BICUBIC)
+    # Full-resolution grain keeps flat areas from producing identical-looking pieces
+    grain = (rng.random((size, size), dtype=np.float32) - 0.5) * 10
+    return np.clip(np.asarray(image, dtype=np.float32) + grain[..., None], 0, 255).astype(np.uint8)
+
+
+def render(category: str, seed: int, size: int = 1024, quality: int = 90) -> bytes:
+    """JPEG bytes for (category, seed)"""
+    buf = io.BytesIO()
+    Image.fromarray(render_pixels(category, seed, size)).save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
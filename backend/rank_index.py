@@ -0,0 +1,241 @@
+"""In-process ranked leaderboards with O(log n) rank and neighbourhood queries."""
+import asyncio
+import logging
+import random
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_LEVEL = 24  # Enough for ~16M entries at p = 1/2
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * level
+        # width[i]: number of bottom-level steps from this node to next[i]
+        self.width = [1] * level
+
+
+class IndexableSkipList:
+    """Sorted multiset of unique keys with positional access.
+
+    insert, remove, index_of and at are all O(log n) expected.
+    """
+
+    def __init__(self):
+        self.tail = _Node(None, 0)
+        self.head = _Node(None, MAX_LEVEL)
+        self.head.next = [self.tail] * MAX_LEVEL
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def _random_level() -> int:
+        level = 1
+        while level < MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    @classmethod
+    def from_sorted(cls, keys) -> "IndexableSkipList":
+        """Build in O(n) from keys that are already sorted and unique"""
+        skiplist = cls()
+        last = [skiplist.head] * MAX_LEVEL
+        last_position = [0] * MAX_LEVEL
+        position = 0
+        for key in keys:
+            position += 1
+            node = _Node(key, cls._random_level())
+            for i in range(len(node.next)):
+                last[i].next[i] = node
+                last[i].width[i] = position - last_position[i]
+                last[i], last_position[i] = node, position
+        for i in range(MAX_LEVEL):
+            last[i].next[i] = skiplist.tail
+            last[i].width[i] = position + 1 - last_position[i]
+        skiplist.size = position
+        return skiplist
+
+    def _predecessors(self, key):
+        """Last node before `key` on every level, plus its bottom-level position"""
+        chain = [None] * MAX_LEVEL
+        steps = [0] * MAX_LEVEL
+        node = self.head
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not self.tail and node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        return chain, steps
+
+    def insert(self, key):
+        chain, steps_at_level = self._predecessors(key)
+        level = self._random_level()
+        node = _Node(key, level)
+        steps = 0
+        for i in range(level):
+            prev = chain[i]
+            node.next[i] = prev.next[i]
+            prev.next[i] = node
+            node.width[i] = prev.width[i] - steps
+            prev.width[i] = steps + 1
+            steps += steps_at_level[i]
+        for i in range(level, MAX_LEVEL):
+            chain[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain, _ = self._predecessors(key)
+        node = chain[0].next[0]
+        if node is self.tail or node.key != key:
+            raise KeyError(key)
+        for i in range(len(node.next)):
+            prev = chain[i]
+            prev.width[i] += node.width[i] - 1
+            prev.next[i] = node.next[i]
+        for i in range(len(node.next), MAX_LEVEL):
+            chain[i].width[i] -= 1
+        self.size -= 1
+
+    def index_of(self, key) -> int:
+        """0-based position of `key`; raises KeyError when absent"""
+        chain, steps = self._predecessors(key)
+        node = chain[0].next[0]
+        if node is self.tail or node.key != key:
+            raise KeyError(key)
+        return sum(steps)
+
+    def at(self, index: int):
+        return next(self.iter_from(index))
+
+    def iter_from(self, index: int):
+        """Yield keys in order starting at 0-based `index`"""
+        if index < 0 or index >= self.size:
+            raise IndexError(index)
+        node = self.head
+        remaining = index + 1
+        for level in reversed(range(MAX_LEVEL)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        while node is not self.tail:
+            yield node.key
+            node = node.next[0]
+
+
+class RankedBoard:
+    """Scores per user ordered by (score desc, user_id); ranks are 1-based."""
+
+    def __init__(self, scores: Optional[Dict[str, int]] = None):
+        self.scores: Dict[str, int] = dict(scores or {})
+        self._order = IndexableSkipList.from_sorted(
+            sorted((-score, user_id) for user_id, score in self.scores.items())
+        )
+
+    def __len__(self):
+        return len(self._order)
+
+    def set(self, user_id: str, score: int):
+        old = self.scores.get(user_id)
+        if old is not None:
+            self._order.remove((-old, user_id))
+        self._order.insert((-score, user_id))
+        self.scores[user_id] = score
+
+    def increment(self, user_id: str, delta: int):
+        self.set(user_id, self.scores.get(user_id, 0) + delta)
+
+    def rank(self, user_id: str) -> Optional[int]:
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self._order.index_of((-score, user_id)) + 1
+
+    def window(self, start_rank: int, count: int) -> List[Tuple[int, str, int]]:
+        """(rank, user_id, score) for `count` entries starting at `start_rank`"""
+        rows = []
+        if count <= 0 or start_rank > len(self._order):
+            return rows
+        for offset, (neg_score, user_id) in enumerate(self._order.iter_from(start_rank - 1)):
+            if offset == count:
+                break
+            rows.append((start_rank + offset, user_id, -neg_score))
+        return rows
+
+    def around(self, user_id: str, neighbors: int):
+        """Returns (rank, above, below) or None if the user is not ranked"""
+        rank = self.rank(user_id)
+        if rank is None:
+            return None
+        start = max(1, rank - neighbors)
+        rows = self.window(start, rank - start + neighbors + 1)
+        return rank, rows[:rank - start], rows[rank - start + 1:]
+
+
+class RankIndex:
+    """Global and per-category RankedBoards mirrored from the leaderboard collections.
+
+    Each worker process keeps its own copy, updated by its own completions and
+    resynchronised from Mongo every `reload_interval` seconds.
+    """
+
+    def __init__(self, leaderboard_store, reload_interval: float = 300.0):
+        self.store = leaderboard_store
+        self.reload_interval = reload_interval
+        self.global_board = RankedBoard()
+        self.category_boards: Dict[str, RankedBoard] = defaultdict(RankedBoard)
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self):
+        global_scores = {}
+        async for row in self.store.board.find({}, {"_id": 0, "user_id": 1, "total_score": 1}):
+            global_scores[row["user_id"]] = row.get("total_score", 0)
+        category_scores: Dict[str, Dict[str, int]] = defaultdict(dict)
+        async for row in self.store.category_board.find({}, {"_id": 0, "category": 1, "user_id": 1, "total_score": 1}):
+            category_scores[row["category"]][row["user_id"]] = row.get("total_score", 0)
+
+        def build():
+            # Pure-Python and O(n); run off the event loop
+            boards: Dict[str, RankedBoard] = defaultdict(RankedBoard)
+            boards.update({c: RankedBoard(scores) for c, scores in category_scores.items()})
+            return RankedBoard(global_scores), boards
+
+        self.global_board, self.category_boards = await asyncio.to_thread(build)
+
+    def record(self, user_id: str, score: int, category: Optional[str] = None):
+        self.global_board.increment(user_id, score)
+        if category:
+            self.category_boards[category].increment(user_id, score)
+
+    def board(self, category: Optional[str] = None) -> Optional[RankedBoard]:
+        if category is None:
+            return self.global_board
+        return self.category_boards.get(category)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.warning(f"Rank index reload failed: {e}")
+
+    async def start(self):
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
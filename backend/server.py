@@ -1,32 +1,213 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends, Query
+from fastapi.responses import StreamingResponse, PlainTextResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone, timedelta
 from typing import List, Optional
+from collections import defaultdict
+from contextlib import asynccontextmanager
 import os
 import logging
 import base64
 import uuid
-import requests
+import json
+import time
 from pathlib import Path
-from pydantic import BaseModel, Field
+import orjson
+from pydantic import BaseModel, Field, computed_field
+from pymongo.errors import BulkWriteError
 from dotenv import load_dotenv
-from emergentintegrations.llm.openai.image_generation import OpenAIImageGeneration
+from database import Database
+from image_providers import FallbackImageProvider, GeneratedImage, ProceduralImageProvider, create_image_provider
+from image_pool import ImagePool
+from blob_store import create_blob_store
+from dedup import ImageDeduplicator, IngestResult
+from tiling import SUPPORTED_DIFFICULTIES, PieceCutter, grid_for_difficulty
+from derivatives import DerivativePipeline, VARIANTS, FORMATS, negotiate
+from leaderboard import LeaderboardStore
+from user_stats import UserStatsStore
+from rank_index import RankIndex
+from auth_cache import SessionCache
+from write_behind import WriteBehindBuffer
+from single_flight import SingleFlight
+from jobs import GenerationJobs
+from indexes import ensure_indexes
+from http_cache import IMMUTABLE, StaticPayload, SerializedCache, cached_json, etag_matches
+from content_negotiation import ContentNegotiationMiddleware
+from metrics import MetricsRegistry, MetricsMiddleware, MongoCommandMetrics
+from auth_client import EmergentAuthClient, CircuitBreaker, AuthServiceError, CircuitOpenError, DEFAULT_AUTH_URL
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Prometheus metrics, served at /metrics
+metrics = MetricsRegistry()
+image_generation_seconds = metrics.histogram(
+    "image_generation_duration_seconds", "Time taken by the image model per generation", ("category",)
+)
+image_generation_errors = metrics.counter(
+    "image_generation_errors_total", "Image generations that failed", ("category",)
+)
+
+app_startup_seconds = metrics.gauge(
+    "app_startup_duration_seconds", "Time spent in each startup phase of this process", ("phase",)
+)
+
+# MongoDB, connected from MONGO_URL/DB_NAME when the app starts
+db = Database()
+
+# Content-addressed image storage (GridFS by default)
+blob_store = create_blob_store(db)
+
+# Server-side jigsaw cuts, cached per (image hash, difficulty)
+piece_cutter = PieceCutter(db.puzzle_cuts, blob_store)
+
+# Thumbnail/medium/full renditions encoded on a process pool
+derivatives = DerivativePipeline(
+    db.image_variants,
+    blob_store,
+    max_workers=int(os.environ['DERIVATIVE_WORKERS']) if os.environ.get('DERIVATIVE_WORKERS') else None,
+)
+
+# Running per-user leaderboard totals
+leaderboard = LeaderboardStore(db)
+
+# Per-user stats bucketed by difficulty and category for the profile screen
+user_stats = UserStatsStore(db)
+
+# In-memory ranked boards for "my rank" and around-me queries
+rank_index = RankIndex(leaderboard, reload_interval=float(os.environ.get('RANK_INDEX_RELOAD_INTERVAL', '300')))
 
-# Initialize AI Image Generation
-image_gen = OpenAIImageGeneration(api_key=os.environ['EMERGENT_LLM_KEY'])
+# Session token -> user snapshot cache for authenticated routes
+session_cache = SessionCache(
+    max_entries=int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', '10000')),
+    max_bytes=int(os.environ.get('AUTH_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+    ttl=float(os.environ.get('AUTH_CACHE_TTL', '60')),
+)
+
+def invalidate_cached_users(user_ids):
+    for user_id in user_ids:
+        session_cache.invalidate_user(user_id)
+
+
+# Coalesced users.total_score/puzzles_completed increments; off = write-through
+user_stats_buffer = WriteBehindBuffer(
+    db.users,
+    "user_id",
+    durability=os.environ.get('USER_STATS_WRITE_BEHIND', 'off'),
+    max_pending=int(os.environ.get('USER_STATS_MAX_PENDING', '1000')),
+    flush_interval=float(os.environ.get('USER_STATS_FLUSH_INTERVAL', '1')),
+    on_flush=invalidate_cached_users,
+)
+
+# Pooled, non-blocking Emergent Auth client
+auth_client = EmergentAuthClient(
+    url=os.environ.get('EMERGENT_AUTH_URL', DEFAULT_AUTH_URL),
+    timeout=float(os.environ.get('EMERGENT_AUTH_TIMEOUT', '10')),
+    max_concurrency=int(os.environ.get('EMERGENT_AUTH_MAX_CONCURRENCY', '20')),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('EMERGENT_AUTH_FAILURE_THRESHOLD', '5')),
+        reset_timeout=float(os.environ.get('EMERGENT_AUTH_RESET_TIMEOUT', '30')),
+    ),
+)
+
+# Image generation backend (IMAGE_PROVIDER); remote SDKs load on first use
+image_provider = create_image_provider()
+# The persistent pool only keeps primary images; a fallback rendering would
+# outlive the outage that caused it
+pool_image_provider = image_provider.primary if isinstance(image_provider, FallbackImageProvider) else image_provider
+
+# Category-specific prompts
+CATEGORY_PROMPTS = {
+    "animals": "A beautiful, clear photo of a cute animal in its natural habitat, perfect for a jigsaw puzzle",
+    "nature": "A stunning landscape or nature scene with vibrant colors, perfect for a jigsaw puzzle",
+    "food": "A delicious, colorful food item or meal that looks appetizing, perfect for a jigsaw puzzle",
+    "objects": "A common everyday object with clear details and good lighting, perfect for a jigsaw puzzle",
+    "vehicles": "A cool vehicle like a car, plane, or boat with clear details, perfect for a jigsaw puzzle",
+    "buildings": "An interesting building or architectural structure with clear details, perfect for a jigsaw puzzle"
+}
+DEFAULT_PROMPT = "A beautiful, detailed image perfect for a jigsaw puzzle"
+
+# Local renderer behind PuzzleCreate.fast and re-renders of missing images
+procedural_images = ProceduralImageProvider(size=int(os.environ.get('PROCEDURAL_IMAGE_SIZE', '1024')))
+
+async def generate_category_image(category: str, provider=None) -> GeneratedImage:
+    """Generate a single puzzle image for a category with the configured provider"""
+    # Free-form categories share one label so the metric stays bounded
+    label = category if category in CATEGORY_PROMPTS else "other"
+    started = time.perf_counter()
+    try:
+        return await (provider or image_provider).generate(category, CATEGORY_PROMPTS.get(category, DEFAULT_PROMPT))
+    except Exception:
+        image_generation_errors.inc(label)
+        raise
+    finally:
+        image_generation_seconds.observe(time.perf_counter() - started, label)
 
-# Create the main app without a prefix
-app = FastAPI()
+async def generate_pool_image(category: str) -> GeneratedImage:
+    return await generate_category_image(category, pool_image_provider)
+
+# Concurrent inline generations for the same prompt share one upstream call
+generation_flights = SingleFlight(max_waiters=int(os.environ.get('GENERATION_MAX_WAITERS', '32')))
+
+# Perceptual fingerprints of stored images; near-duplicates are reused or rejected
+image_dedup = ImageDeduplicator(
+    db.image_fingerprints,
+    blob_store,
+    policy=os.environ.get('IMAGE_DEDUP_POLICY', 'reuse'),
+    max_distance=int(os.environ.get('IMAGE_DEDUP_MAX_DISTANCE', '6')),
+    algorithm=os.environ.get('IMAGE_DEDUP_HASH', 'phash'),
+    max_attempts=int(os.environ.get('IMAGE_DEDUP_MAX_ATTEMPTS', '3')),
+)
+
+def image_fields(image: GeneratedImage, result: IngestResult) -> dict:
+    """What a puzzle records about its stored image"""
+    if result.duplicate_of is not None:
+        # A reused near-duplicate was made by someone else
+        return {"image_hash": result.key}
+    return {"image_hash": result.key, "generator": image.generator, "seed": image.seed}
+
+async def store_new_image(category: str, generate) -> dict:
+    """Generate and store an image for `category` under the dedup policy"""
+    image = await generate(category)
+    result = await image_dedup.ingest(image.data, category)
+    if result.key:
+        return image_fields(image, result)
+    # A request never waits for another paid generation; the pool refill
+    # is where rejected near-duplicates get replaced
+    return {"image_hash": result.duplicate_of}
+
+async def generate_shared_image(category: str, language: str) -> dict:
+    """Generate and store an image, coalescing identical concurrent requests"""
+    prompt = CATEGORY_PROMPTS.get(category, DEFAULT_PROMPT)
+    return await generation_flights.do(
+        (category, language, prompt), lambda: store_new_image(category, generate_category_image)
+    )
+
+async def render_procedural_image(category: str) -> GeneratedImage:
+    return await procedural_images.generate(category, CATEGORY_PROMPTS.get(category, DEFAULT_PROMPT))
+
+async def store_pool_image(image: GeneratedImage, category: str) -> Optional[dict]:
+    """Pool entries must be new pictures; near-duplicates are discarded under any policy"""
+    result = await image_dedup.ingest(image.data, category)
+    if result.duplicate_of is not None:
+        return None
+    return image_fields(image, result)
+
+# Warm pool of pre-generated images, refilled in the background
+image_pool = ImagePool(
+    db.image_pool,
+    blob_store,
+    generate=generate_pool_image,
+    categories=CATEGORY_PROMPTS.keys(),
+    high_water=int(os.environ.get('IMAGE_POOL_HIGH_WATER', '3')),
+    refill_interval=float(os.environ.get('IMAGE_POOL_REFILL_INTERVAL', '30')),
+    store=store_pool_image,
+    max_discards=image_dedup.max_attempts,
+    discard_backoff=float(os.environ.get('IMAGE_POOL_DISCARD_BACKOFF', '600')),
+    leases=db.image_pool_leases,
+    lease=float(os.environ.get('IMAGE_POOL_REFILL_LEASE', '120')),
+)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -63,15 +244,54 @@ class Puzzle(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
     category: str
-    difficulty: int  # 9, 16, 25, 36, 49, 64, 81, 100
-    image_base64: str
+    difficulty: int  # 9, 16, 25, 36, 49, 64
+    image_hash: Optional[str] = None  # Blob store key, see GET /api/puzzles/{id}/image
+    image_base64: Optional[str] = None  # Legacy documents not yet migrated
+    generator: Optional[str] = None  # Image provider, e.g. "openai" or "procedural"
+    seed: Optional[int] = None  # Procedural images re-render from (category, seed)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     language: str = "en"
 
+    @computed_field
+    @property
+    def image_url(self) -> str:
+        return f"/api/puzzles/{self.id}/image"
+
+def puzzle_payload(doc: dict) -> dict:
+    """Shape a puzzles document like Puzzle's JSON without building the model.
+
+    Read endpoints return this through ORJSONResponse and keep Puzzle as
+    response_model for the schema only; keep the two in sync.
+    """
+    return {
+        "id": doc["id"],
+        "title": doc["title"],
+        "category": doc["category"],
+        "difficulty": doc["difficulty"],
+        "image_hash": doc.get("image_hash"),
+        "image_base64": doc.get("image_base64"),
+        "generator": doc.get("generator"),
+        "seed": doc.get("seed"),
+        "created_at": doc["created_at"],
+        "language": doc.get("language", "en"),
+        "image_url": f"/api/puzzles/{doc['id']}/image",
+    }
+
 class PuzzleCreate(BaseModel):
     category: str
     difficulty: int
     language: str = "en"
+    fast: bool = False  # Render a procedural image locally instead of calling the image model
+
+class GenerationJob(BaseModel):
+    id: str
+    status: str  # queued, running, succeeded or failed
+    params: PuzzleCreate
+    puzzle: Optional[Puzzle] = None  # Set once the job has succeeded
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime
+    updated_at: datetime
 
 class UserProgress(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -81,6 +301,7 @@ class UserProgress(BaseModel):
     time_taken: int  # seconds
     score: int
     difficulty: int
+    category: Optional[str] = None  # Denormalized from the puzzle for category rollups
 
 class UserProgressCreate(BaseModel):
     user_id: str
@@ -88,6 +309,13 @@ class UserProgressCreate(BaseModel):
     time_taken: int  # seconds
     difficulty: int
 
+class CompletionSubmission(UserProgressCreate):
+    completion_id: str  # Client-generated; resubmitting the same id is a no-op
+    completed_at: Optional[datetime] = None  # When the puzzle was finished offline
+
+class BatchProgressCreate(BaseModel):
+    completions: List[CompletionSubmission] = Field(..., min_length=1, max_length=500)
+
 class LeaderboardEntry(BaseModel):
     user_id: str
     username: str
@@ -95,6 +323,17 @@ class LeaderboardEntry(BaseModel):
     puzzles_completed: int
     average_time: float
 
+class RankedLeaderboardEntry(LeaderboardEntry):
+    rank: int
+
+class LeaderboardRank(BaseModel):
+    user_id: str
+    rank: int
+    total_users: int
+    entry: RankedLeaderboardEntry
+    above: List[RankedLeaderboardEntry]
+    below: List[RankedLeaderboardEntry]
+
 # Helper function to get user from session
 async def get_session_token_from_request(request: Request):
     # First try cookies, then Authorization header
@@ -110,6 +349,10 @@ async def get_current_user(request: Request):
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
+    cached_user = session_cache.get(session_token)
+    if cached_user is not None:
+        return User(**cached_user)
+    
     # Find session in database
     session_doc = await db.user_sessions.find_one(
         {"session_token": session_token},
@@ -137,6 +380,7 @@ async def get_current_user(request: Request):
     if not user_doc:
         raise HTTPException(status_code=401, detail="User not found")
     
+    session_cache.put(session_token, user_doc, expires_at)
     return User(**user_doc)
 
 # Auth endpoints
@@ -174,17 +418,11 @@ async def process_oauth_session(request: Request, response: Response):
     
     try:
         # Call Emergent Auth service to get user data
-        auth_response = requests.get(
-            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-            headers={"X-Session-ID": session_id},
-            timeout=10
-        )
+        user_data = await auth_client.session_data(session_id)
         
-        if auth_response.status_code != 200:
+        if user_data is None:
             raise HTTPException(status_code=401, detail="Invalid session")
         
-        user_data = auth_response.json()
-        
         # Check if user exists by email
         existing_user = await db.users.find_one(
             {"email": user_data["email"]}, 
@@ -201,6 +439,8 @@ async def process_oauth_session(request: Request, response: Response):
                     "picture": user_data.get("picture"),
                 }}
             )
+            await leaderboard.set_username(user_id, user_data["name"])
+            session_cache.invalidate_user(user_id)
         else:
             # Create new user
             user_id = f"user_{uuid.uuid4().hex[:12]}"
@@ -243,8 +483,10 @@ async def process_oauth_session(request: Request, response: Response):
         
         return {"user": user_doc, "message": "Authentication successful"}
         
-    except requests.RequestException:
-        raise HTTPException(status_code=500, detail="Authentication service error")
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Authentication service unavailable")
+    except AuthServiceError:
+        raise HTTPException(status_code=502, detail="Authentication service error")
 
 @api_router.get("/auth/me", response_model=dict)
 async def get_current_user_info(request: Request):
@@ -259,6 +501,7 @@ async def logout_user(request: Request, response: Response):
     if session_token:
         # Remove session from database
         await db.user_sessions.delete_one({"session_token": session_token})
+        session_cache.invalidate_token(session_token)
     
     # Clear cookie
     response.delete_cookie(
@@ -270,76 +513,203 @@ async def logout_user(request: Request, response: Response):
     
     return {"message": "Logged out successfully"}
 
+@api_router.get("/auth/cache/stats")
+async def get_auth_cache_stats():
+    """Session cache size and hit-rate counters"""
+    return session_cache.report()
+
 # Puzzle endpoints
+# Static lists, serialized once with content-hash validators
+CATEGORIES = StaticPayload([
+    {"id": "animals", "name": "Animals", "icon": "🐾"},
+    {"id": "nature", "name": "Nature", "icon": "🌿"},
+    {"id": "food", "name": "Food", "icon": "🍎"},
+    {"id": "objects", "name": "Objects", "icon": "📱"},
+    {"id": "vehicles", "name": "Vehicles", "icon": "🚗"},
+    {"id": "buildings", "name": "Buildings", "icon": "🏢"},
+])
+# Exactly the levels the piece cutter accepts
+DIFFICULTY_NAMES = ["Easy", "Normal", "Hard", "Expert", "Master", "Extreme"]
+DIFFICULTIES = StaticPayload([
+    {"level": level, "name": name, "pieces": f"{grid_for_difficulty(level)}x{grid_for_difficulty(level)}"}
+    for level, name in zip(SUPPORTED_DIFFICULTIES, DIFFICULTY_NAMES, strict=True)
+])
+
 @api_router.get("/puzzles/categories")
-async def get_categories():
-    categories = [
-        {"id": "animals", "name": "Animals", "icon": "🐾"},
-        {"id": "nature", "name": "Nature", "icon": "🌿"},
-        {"id": "food", "name": "Food", "icon": "🍎"},
-        {"id": "objects", "name": "Objects", "icon": "📱"},
-        {"id": "vehicles", "name": "Vehicles", "icon": "🚗"},
-        {"id": "buildings", "name": "Buildings", "icon": "🏢"},
-    ]
-    return categories
+async def get_categories(request: Request):
+    return CATEGORIES.response(request)
 
 @api_router.get("/puzzles/difficulties")
-async def get_difficulties():
-    difficulties = [
-        {"level": 9, "name": "Easy", "pieces": "3x3"},
-        {"level": 16, "name": "Normal", "pieces": "4x4"},
-        {"level": 25, "name": "Hard", "pieces": "5x5"},
-        {"level": 36, "name": "Expert", "pieces": "6x6"},
-        {"level": 49, "name": "Master", "pieces": "7x7"},
-        {"level": 64, "name": "Extreme", "pieces": "8x8"},
-    ]
-    return difficulties
+async def get_difficulties(request: Request):
+    return DIFFICULTIES.response(request)
+
+async def create_puzzle(puzzle_data: PuzzleCreate) -> Puzzle:
+    """Pick or generate an image for a new puzzle and save it"""
+    # Fast mode renders locally; otherwise serve from the warm pool when
+    # possible and generate inline on a miss
+    pooled = None if puzzle_data.fast else await image_pool.take(puzzle_data.category)
+    if puzzle_data.fast:
+        image = await store_new_image(puzzle_data.category, render_procedural_image)
+    elif pooled and pooled.get("image_hash"):
+        image = {key: pooled.get(key) for key in ("image_hash", "generator", "seed")}
+    elif pooled:
+        # Pool entry written before the blob store migration
+        image = {"image_hash": await blob_store.put(base64.b64decode(pooled["image_base64"]))}
+    else:
+        image = await generate_shared_image(puzzle_data.category, puzzle_data.language)
+    
+    # Create puzzle
+    puzzle = Puzzle(
+        title=f"{puzzle_data.category.title()} Puzzle",
+        category=puzzle_data.category,
+        difficulty=puzzle_data.difficulty,
+        language=puzzle_data.language,
+        **image
+    )
+    
+    # Save to database
+    await db.puzzles.insert_one(puzzle.dict(exclude={"image_url"}))
+    derivatives.schedule(puzzle.image_hash)
+    
+    return puzzle
 
 @api_router.post("/puzzles/generate", response_model=Puzzle)
 async def generate_puzzle(puzzle_data: PuzzleCreate):
     try:
-        # Category-specific prompts
-        prompts = {
-            "animals": "A beautiful, clear photo of a cute animal in its natural habitat, perfect for a jigsaw puzzle",
-            "nature": "A stunning landscape or nature scene with vibrant colors, perfect for a jigsaw puzzle",
-            "food": "A delicious, colorful food item or meal that looks appetizing, perfect for a jigsaw puzzle",
-            "objects": "A common everyday object with clear details and good lighting, perfect for a jigsaw puzzle",
-            "vehicles": "A cool vehicle like a car, plane, or boat with clear details, perfect for a jigsaw puzzle",
-            "buildings": "An interesting building or architectural structure with clear details, perfect for a jigsaw puzzle"
-        }
-        
-        prompt = prompts.get(puzzle_data.category, "A beautiful, detailed image perfect for a jigsaw puzzle")
-        
-        # Generate image using AI
-        images = await image_gen.generate_images(
-            prompt=prompt,
-            model="gpt-image-1",
-            number_of_images=1
-        )
-        
-        if not images or len(images) == 0:
-            raise HTTPException(status_code=500, detail="Failed to generate image")
-        
-        # Convert to base64
-        image_base64 = base64.b64encode(images[0]).decode('utf-8')
-        
-        # Create puzzle
-        puzzle = Puzzle(
-            title=f"{puzzle_data.category.title()} Puzzle",
-            category=puzzle_data.category,
-            difficulty=puzzle_data.difficulty,
-            image_base64=image_base64,
-            language=puzzle_data.language
-        )
-        
-        # Save to database
-        await db.puzzles.insert_one(puzzle.dict())
-        
-        return puzzle
-        
+        return await create_puzzle(puzzle_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating puzzle: {str(e)}")
 
+async def run_generation_job(params: dict) -> dict:
+    puzzle = await create_puzzle(PuzzleCreate(**params))
+    return puzzle.dict(exclude={"image_url"})
+
+# Queued generations run on a bounded worker pool instead of inside requests
+generation_jobs = GenerationJobs(
+    db.generation_jobs,
+    run_generation_job,
+    concurrency=int(os.environ.get('GENERATION_JOB_CONCURRENCY', '4')),
+    retention=float(os.environ.get('GENERATION_JOB_RETENTION', str(24 * 3600))),
+    lease=float(os.environ.get('GENERATION_JOB_LEASE', '60')),
+)
+
+def generation_job_response(job: dict) -> GenerationJob:
+    return GenerationJob(**job, puzzle=job.get("result"))
+
+@api_router.post("/puzzles/jobs", response_model=GenerationJob, status_code=202)
+async def submit_generation_job(puzzle_data: PuzzleCreate):
+    """Queue a puzzle generation and return at once; poll or subscribe for the result"""
+    job = await generation_jobs.submit(puzzle_data.dict())
+    return generation_job_response(job)
+
+@api_router.get("/puzzles/jobs/stats")
+async def get_generation_job_stats():
+    """Report worker count, queue depth and job outcomes"""
+    return await generation_jobs.report()
+
+@api_router.get("/puzzles/jobs/{job_id}", response_model=GenerationJob)
+async def get_generation_job(job_id: str):
+    job = await generation_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return generation_job_response(job)
+
+@api_router.get("/puzzles/jobs/{job_id}/events")
+async def stream_generation_job(job_id: str):
+    """Server-sent events: one per status change, ending when the job finishes"""
+    if not await generation_jobs.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        async for job in generation_jobs.watch(job_id):
+            if job is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {job['status']}\ndata: {generation_job_response(job).model_dump_json()}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/puzzles/generate/stats")
+async def get_generation_stats():
+    """Report coalesced inline generations and provider fallbacks"""
+    return {**generation_flights.report(), "provider": image_provider.report()}
+
+@api_router.get("/puzzles/pool/stats")
+async def get_image_pool_stats():
+    """Report image pool depth, hit/miss counts and refill lag per category"""
+    return await image_pool.report()
+
+@api_router.get("/puzzles/dedup/stats")
+async def get_image_dedup_stats():
+    """Report how many generated images were unique, reused or rejected"""
+    return image_dedup.report()
+
+CATALOG_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "category": 1, "difficulty": 1, "language": 1, "created_at": 1
+}
+CATALOG_SORT = [("category", 1), ("difficulty", 1), ("created_at", -1), ("id", -1)]
+
+def encode_catalog_cursor(doc: dict) -> str:
+    key = [doc["category"], doc["difficulty"], doc["created_at"].isoformat(), doc["id"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_catalog_cursor(cursor: str) -> dict:
+    """Turn a cursor back into a keyset condition matching CATALOG_SORT"""
+    try:
+        category, difficulty, created_at, puzzle_id = json.loads(base64.urlsafe_b64decode(cursor))
+        created_at = datetime.fromisoformat(created_at)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"category": {"$gt": category}},
+        {"category": category, "difficulty": {"$gt": difficulty}},
+        {"category": category, "difficulty": difficulty, "created_at": {"$lt": created_at}},
+        {"category": category, "difficulty": difficulty, "created_at": created_at, "id": {"$lt": puzzle_id}},
+    ]}
+
+@api_router.get("/puzzles/catalog")
+async def get_puzzle_catalog(
+    category: Optional[str] = None,
+    difficulty: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=500)
+):
+    """Metadata-only puzzle listing with keyset pagination, streamed as it is read"""
+    query = {}
+    if category:
+        query["category"] = category
+    if difficulty:
+        query["difficulty"] = difficulty
+    if cursor:
+        query = {"$and": [query, decode_catalog_cursor(cursor)]}
+    
+    # Read one extra document to know whether there is a next page
+    docs = db.puzzles.find(query, CATALOG_PROJECTION).sort(CATALOG_SORT).limit(limit + 1).batch_size(min(limit + 1, 100))
+    
+    async def body():
+        yield b'{"items":['
+        count, last = 0, None
+        async for doc in docs:
+            if count == limit:
+                break
+            item = {
+                **doc,
+                "created_at": doc["created_at"].isoformat(),
+                "thumbnail_url": f"/api/puzzles/{doc['id']}/image?variant=thumb",
+            }
+            yield (b"," if count else b"") + json.dumps(item).encode()
+            count, last = count + 1, doc
+        else:
+            last = None  # Exhausted before limit + 1: this is the final page
+        next_cursor = encode_catalog_cursor(last) if last else None
+        yield b'],"next_cursor":' + json.dumps(next_cursor).encode() + b"}"
+    
+    return StreamingResponse(body(), media_type="application/json")
+
 @api_router.get("/puzzles", response_model=List[Puzzle])
 async def get_puzzles(category: Optional[str] = None, difficulty: Optional[int] = None, limit: int = 20):
     query = {}
@@ -348,23 +718,196 @@ async def get_puzzles(category: Optional[str] = None, difficulty: Optional[int]
     if difficulty:
         query["difficulty"] = difficulty
     
-    puzzles = await db.puzzles.find(query).limit(limit).to_list(1000)
-    return [Puzzle(**puzzle) for puzzle in puzzles]
+    puzzles = await db.puzzles.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(1000)
+    return ORJSONResponse([puzzle_payload(puzzle) for puzzle in puzzles])
+
+# Serialized puzzle bodies; puzzles only change when a lost image is restored
+puzzle_responses = SerializedCache(int(os.environ.get('PUZZLE_RESPONSE_CACHE_SIZE', '1024')))
 
 @api_router.get("/puzzles/{puzzle_id}", response_model=Puzzle)
-async def get_puzzle(puzzle_id: str):
-    puzzle = await db.puzzles.find_one({"id": puzzle_id})
+async def get_puzzle(puzzle_id: str, request: Request):
+    """Served as immutable with a body-hash ETag; cached bodies revalidate without the database"""
+    # Only a puzzle that exists can be "not modified"
+    cached = puzzle_responses.get(puzzle_id)
+    if cached is None:
+        puzzle = await db.puzzles.find_one({"id": puzzle_id}, {"_id": 0})
+        if not puzzle:
+            raise HTTPException(status_code=404, detail="Puzzle not found")
+        body = orjson.dumps(puzzle_payload(puzzle))
+        if puzzle.get("image_base64"):
+            # Not migrated yet; migrate-images will still rewrite this document
+            return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-cache"})
+        cached = puzzle_responses.put(puzzle_id, body, puzzle.get("updated_at") or puzzle["created_at"])
+    
+    body, last_modified, etag = cached
+    return cached_json(request, body, etag, IMMUTABLE, last_modified)
+
+def parse_range_header(range_header: Optional[str], length: int):
+    """Parse a single `bytes=` range into (start, end_exclusive).
+
+    Returns None when the whole body should be sent and raises 416 when the
+    range cannot be satisfied. Multi-range requests fall back to the full body.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            start, end = max(0, length - int(last)), length
+        else:
+            start = int(first)
+            end = min(length, int(last) + 1) if last else length
+    except ValueError:
+        return None
+    if start >= length or start >= end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{length}"}
+        )
+    return start, end
+
+async def stream_blob(request: Request, key: str, vary: Optional[str] = None):
+    """Serve a blob with Content-Length, ETag and single Range support"""
+    info = await blob_store.stat(key)
+    if not info:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    length = info["length"]
+    headers = {
+        "ETag": f'"{key}"',
+        "Accept-Ranges": "bytes",
+        "Cache-Control": IMMUTABLE,
+    }
+    if vary:
+        headers["Vary"] = vary
+    if etag_matches(request.headers.get("If-None-Match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    byte_range = parse_range_header(request.headers.get("Range"), length)
+    start, end = byte_range or (0, length)
+    status_code = 200
+    if byte_range:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{length}"
+    headers["Content-Length"] = str(end - start)
+    
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=info["content_type"])
+    return StreamingResponse(
+        blob_store.stream(key, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=info["content_type"]
+    )
+
+@api_router.api_route("/puzzles/{puzzle_id}/image", methods=["GET", "HEAD"])
+async def get_puzzle_image(
+    puzzle_id: str,
+    request: Request,
+    variant: Optional[str] = None,
+    w: Optional[int] = Query(None, ge=1),
+    format: Optional[str] = None
+):
+    """Stream the puzzle image, optionally as a resized/re-encoded variant.
+
+    `variant` (thumb, medium, full) and `format` (webp, jpeg) can be requested
+    explicitly; otherwise they are negotiated from the `w` width hint and the
+    Accept header. Without any of these the original upload is served.
+    """
+    if variant is not None and variant not in VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Unknown variant, expected one of {list(VARIANTS)}")
+    if format is not None and format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format, expected one of {list(FORMATS)}")
+    
+    puzzle = await db.puzzles.find_one(
+        {"id": puzzle_id}, {"_id": 0, "image_hash": 1, "category": 1, "generator": 1, "seed": 1}
+    )
     if not puzzle:
         raise HTTPException(status_code=404, detail="Puzzle not found")
-    return Puzzle(**puzzle)
+    if not puzzle.get("image_hash"):
+        raise HTTPException(status_code=404, detail="Image not migrated to the blob store")
+    if puzzle.get("seed") is not None and await blob_store.stat(puzzle["image_hash"]) is None:
+        puzzle["image_hash"] = await restore_procedural_image(puzzle_id, puzzle)
+    
+    choice = negotiate(variant, w, format, request.headers.get("Accept", ""))
+    if choice is None:
+        return await stream_blob(request, puzzle["image_hash"], vary="Accept")
+    try:
+        key = await derivatives.render(puzzle["image_hash"], *choice)
+    except Exception as e:
+        logger.warning(f"Serving original image for {puzzle_id}, derivative failed: {e}")
+        key = puzzle["image_hash"]
+    return await stream_blob(request, key, vary="Accept")
+
+async def restore_procedural_image(puzzle_id: str, puzzle: dict) -> str:
+    """Re-render a procedural image whose blob is gone from its (category, seed)"""
+    key = await blob_store.put(await procedural_images.render(puzzle["category"], puzzle["seed"]))
+    if key != puzzle["image_hash"]:
+        # Same picture, different bytes (e.g. another JPEG encoder version)
+        logger.warning(f"Re-rendered image for {puzzle_id} differs from the original encoding")
+        await db.puzzles.update_one(
+            {"id": puzzle_id}, {"$set": {"image_hash": key, "updated_at": datetime.now(timezone.utc)}}
+        )
+        # The cached body carries the old hash; the new one gets a new ETag
+        puzzle_responses.discard(puzzle_id)
+    return key
+
+async def get_puzzle_cut(puzzle_id: str, difficulty: Optional[int]):
+    puzzle = await db.puzzles.find_one({"id": puzzle_id}, {"_id": 0, "image_hash": 1, "difficulty": 1})
+    if not puzzle or not puzzle.get("image_hash"):
+        raise HTTPException(status_code=404, detail="Puzzle not found")
+    difficulty = difficulty or puzzle["difficulty"]
+    try:
+        grid_for_difficulty(difficulty)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return difficulty, await piece_cutter.get_cut(puzzle["image_hash"], difficulty)
+
+@api_router.get("/puzzles/{puzzle_id}/pieces")
+async def get_puzzle_pieces(puzzle_id: str, response: Response, difficulty: Optional[int] = None):
+    """Geometry index of the server-cut pieces; the sprites live in the atlas"""
+    difficulty, cut = await get_puzzle_cut(puzzle_id, difficulty)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return {
+        **cut["geometry"],
+        "difficulty": difficulty,
+        "atlas_url": f"/api/puzzles/{puzzle_id}/pieces/atlas?difficulty={difficulty}",
+    }
+
+@api_router.api_route("/puzzles/{puzzle_id}/pieces/atlas", methods=["GET", "HEAD"])
+async def get_puzzle_pieces_atlas(puzzle_id: str, request: Request, difficulty: Optional[int] = None):
+    """Stream the sprite atlas holding every piece of the puzzle"""
+    _, cut = await get_puzzle_cut(puzzle_id, difficulty)
+    return await stream_blob(request, cut["atlas_hash"])
 
 # Progress endpoints
+def calculate_score(difficulty: int, time_taken: int) -> int:
+    # Calculate score based on difficulty and time
+    base_score = difficulty * 10
+    time_bonus = max(0, 300 - time_taken)  # Bonus for completing quickly
+    return base_score + time_bonus
+
+async def record_completions(progress: List[dict]):
+    """Apply user stats, leaderboard and rank updates for newly saved progress rows"""
+    user_totals = defaultdict(lambda: {"total_score": 0, "puzzles_completed": 0})
+    for row in progress:
+        user_totals[row["user_id"]]["total_score"] += row["score"]
+        user_totals[row["user_id"]]["puzzles_completed"] += 1
+    
+    # Update user stats; cached snapshots are dropped once the increments land
+    await user_stats_buffer.increment_many(user_totals)
+    await leaderboard.record_many(progress)
+    await user_stats.record_many(progress)
+    for row in progress:
+        rank_index.record(row["user_id"], row["score"], row.get("category"))
+
 @api_router.post("/progress/complete", response_model=dict)
 async def complete_puzzle(progress_data: UserProgressCreate):
-    # Calculate score based on difficulty and time
-    base_score = progress_data.difficulty * 10
-    time_bonus = max(0, 300 - progress_data.time_taken)  # Bonus for completing quickly
-    total_score = base_score + time_bonus
+    total_score = calculate_score(progress_data.difficulty, progress_data.time_taken)
+    
+    puzzle = await db.puzzles.find_one({"id": progress_data.puzzle_id}, {"_id": 0, "category": 1})
     
     # Create full progress object
     progress = UserProgress(
@@ -372,170 +915,205 @@ async def complete_puzzle(progress_data: UserProgressCreate):
         puzzle_id=progress_data.puzzle_id,
         time_taken=progress_data.time_taken,
         difficulty=progress_data.difficulty,
-        score=total_score
+        score=total_score,
+        category=puzzle["category"] if puzzle else None
     )
     
     # Save progress
     await db.user_progress.insert_one(progress.dict())
-    
-    # Update user stats
-    await db.users.update_one(
-        {"id": progress_data.user_id},
-        {
-            "$inc": {
-                "total_score": total_score,
-                "puzzles_completed": 1
-            }
-        }
-    )
+    await record_completions([progress.dict()])
     
     return {"message": "Puzzle completed!", "score": total_score}
 
-@api_router.get("/progress/user/{user_id}")
-async def get_user_progress(user_id: str):
-    progress = await db.user_progress.find({"user_id": user_id}).to_list(1000)
-    user = await db.users.find_one({"id": user_id})
+@api_router.post("/progress/complete/batch", response_model=dict)
+async def complete_puzzles_batch(batch: BatchProgressCreate):
+    """Record many completions at once, e.g. when an offline client syncs.
+
+    Each completion_id becomes the progress row id, so completions that were
+    already recorded are skipped and never double-count score.
+    """
+    submissions = list({c.completion_id: c for c in batch.completions}.values())
+    puzzle_ids = list({c.puzzle_id for c in submissions})
+    categories = {
+        puzzle["id"]: puzzle["category"]
+        async for puzzle in db.puzzles.find({"id": {"$in": puzzle_ids}}, {"_id": 0, "id": 1, "category": 1})
+    }
+    
+    progress = []
+    for c in submissions:
+        row = UserProgress(
+            id=c.completion_id,
+            user_id=c.user_id,
+            puzzle_id=c.puzzle_id,
+            time_taken=c.time_taken,
+            difficulty=c.difficulty,
+            score=calculate_score(c.difficulty, c.time_taken),
+            category=categories.get(c.puzzle_id)
+        )
+        if c.completed_at:
+            row.completed_at = c.completed_at
+        progress.append(row.dict())
+    
+    failed = {}
+    try:
+        await db.user_progress.insert_many(progress, ordered=False)
+    except BulkWriteError as e:
+        failed = {err["index"]: err["code"] for err in e.details.get("writeErrors", [])}
+    inserted = [row for i, row in enumerate(progress) if i not in failed]
+    if inserted:
+        await record_completions(inserted)
     
+    if any(code != 11000 for code in failed.values()):
+        raise HTTPException(status_code=500, detail="Some completions could not be saved")
+    
+    return {
+        "message": "Puzzles completed!",
+        "accepted": len(inserted),
+        "duplicates": len(failed),
+        "total_score": sum(row["score"] for row in inserted),
+        "scores": {row["id"]: row["score"] for row in progress}
+    }
+
+@api_router.get("/progress/write-behind/stats")
+async def get_write_behind_stats():
+    """Report user stat buffer depth, coalescing and flush latency"""
+    return user_stats_buffer.report()
+
+PROGRESS_PROJECTION = {"_id": 0}
+PROGRESS_SORT = [("completed_at", -1), ("id", -1)]
+# Everything the profile screen shows; never the password hash
+USER_SUMMARY_PROJECTION = {
+    "_id": 0, "user_id": 1, "username": 1, "email": 1, "picture": 1, "preferred_language": 1,
+    "created_at": 1, "total_score": 1, "puzzles_completed": 1
+}
+
+def encode_progress_cursor(row: dict) -> str:
+    key = [row["completed_at"].isoformat(), row["id"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_progress_cursor(cursor: str) -> dict:
+    """Turn a cursor back into a keyset condition matching PROGRESS_SORT"""
+    try:
+        completed_at, progress_id = json.loads(base64.urlsafe_b64decode(cursor))
+        completed_at = datetime.fromisoformat(completed_at)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"completed_at": {"$lt": completed_at}},
+        {"completed_at": completed_at, "id": {"$lt": progress_id}},
+    ]}
+
+def progress_query(user_id: str, cursor: Optional[str]) -> dict:
+    query = {"user_id": user_id}
+    if cursor:
+        query = {"$and": [query, decode_progress_cursor(cursor)]}
+    return query
+
+async def get_progress_summary(user_id: str) -> dict:
+    """Profile totals from two indexed single-document reads"""
+    user = await db.users.find_one({"user_id": user_id}, USER_SUMMARY_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # total_time is only kept on the leaderboard row
+    board = (await leaderboard.entries([user_id])).get(user_id)
     return {
         "user": user,
-        "progress": progress,
         "total_score": user.get("total_score", 0),
-        "puzzles_completed": user.get("puzzles_completed", 0)
+        "puzzles_completed": user.get("puzzles_completed", 0),
+        "average_time": board["average_time"] if board else 0
+    }
+
+@api_router.get("/progress/user/{user_id}/summary")
+async def get_user_progress_summary(user_id: str):
+    return await get_progress_summary(user_id)
+
+@api_router.get("/progress/user/{user_id}/stats")
+async def get_user_stats(user_id: str):
+    """Per-difficulty and per-category counts, times and score histograms"""
+    stats = await user_stats.get(user_id)
+    if stats is None:
+        if not await db.users.find_one({"user_id": user_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="User not found")
+        stats = {"user_id": user_id, "difficulty": {}, "category": {}, "updated_at": None}
+    return stats
+
+@api_router.get("/progress/user/{user_id}/history")
+async def stream_user_progress(user_id: str, cursor: Optional[str] = None, limit: Optional[int] = Query(None, ge=1)):
+    """Full progress history as NDJSON, newest first, read straight off the cursor"""
+    rows = db.user_progress.find(progress_query(user_id, cursor), PROGRESS_PROJECTION).sort(PROGRESS_SORT).batch_size(500)
+    if limit:
+        rows = rows.limit(limit)
+    
+    async def body():
+        async for row in rows:
+            row["completed_at"] = row["completed_at"].isoformat()
+            yield json.dumps(row).encode() + b"\n"
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@api_router.get("/progress/user/{user_id}")
+async def get_user_progress(user_id: str, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    """Profile summary plus one page of progress, newest first"""
+    summary = await get_progress_summary(user_id)
+    
+    # Read one extra row to know whether there is a next page
+    progress = await db.user_progress.find(
+        progress_query(user_id, cursor), PROGRESS_PROJECTION
+    ).sort(PROGRESS_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_progress_cursor(progress[limit - 1]) if len(progress) > limit else None
+    
+    return {
+        **summary,
+        "progress": progress[:limit],
+        "next_cursor": next_cursor
     }
 
 # Leaderboard endpoints
 @api_router.get("/leaderboard/global", response_model=List[LeaderboardEntry])
 async def get_global_leaderboard(limit: int = 50):
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "user_progress",
-                "localField": "id",
-                "foreignField": "user_id",
-                "as": "progress"
-            }
-        },
-        {
-            "$addFields": {
-                "average_time": {
-                    "$cond": {
-                        "if": {"$gt": [{"$size": "$progress"}, 0]},
-                        "then": {"$avg": "$progress.time_taken"},
-                        "else": 0
-                    }
-                }
-            }
-        },
-        {
-            "$sort": {"total_score": -1}
-        },
-        {
-            "$limit": limit
-        }
-    ]
-    
-    users = await db.users.aggregate(pipeline).to_list(1000)
-    
-    leaderboard = []
-    for user in users:
-        entry = LeaderboardEntry(
-            user_id=user["id"],
-            username=user["username"],
-            total_score=user.get("total_score", 0),
-            puzzles_completed=user.get("puzzles_completed", 0),
-            average_time=user.get("average_time", 0)
-        )
-        leaderboard.append(entry)
-    
-    return leaderboard
+    # Rows already have LeaderboardEntry's shape, see leaderboard_entry
+    return ORJSONResponse(await leaderboard.top(limit))
 
 @api_router.get("/leaderboard/category/{category}", response_model=List[LeaderboardEntry])
 async def get_category_leaderboard(category: str, limit: int = 50):
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "user_progress",
-                "localField": "id",
-                "foreignField": "user_id",
-                "as": "progress"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "puzzles",
-                "localField": "progress.puzzle_id",
-                "foreignField": "id",
-                "as": "puzzles"
-            }
-        },
-        {
-            "$match": {
-                "puzzles.category": category
-            }
-        },
-        {
-            "$addFields": {
-                "category_score": {
-                    "$sum": {
-                        "$map": {
-                            "input": "$progress",
-                            "as": "p",
-                            "in": {
-                                "$cond": {
-                                    "if": {"$in": ["$$p.puzzle_id", "$puzzles.id"]},
-                                    "then": "$$p.score",
-                                    "else": 0
-                                }
-                            }
-                        }
-                    }
-                },
-                "category_completed": {
-                    "$size": {
-                        "$filter": {
-                            "input": "$progress",
-                            "cond": {"$in": ["$$this.puzzle_id", "$puzzles.id"]}
-                        }
-                    }
-                }
-            }
-        },
-        {
-            "$sort": {"category_score": -1}
-        },
-        {
-            "$limit": limit
+    return ORJSONResponse(await leaderboard.top_category(category, limit))
+
+async def get_leaderboard_rank(user_id: str, neighbors: int, category: Optional[str] = None):
+    board = rank_index.board(category)
+    ranked = board.around(user_id, neighbors) if board is not None else None
+    if ranked is None:
+        raise HTTPException(status_code=404, detail="User not ranked")
+    rank, above, below = ranked
+    
+    rows = above + [(rank, user_id, board.scores[user_id])] + below
+    entries = await leaderboard.entries([row_user for _, row_user, _ in rows], category)
+    ranked_entries = []
+    for row_rank, row_user, score in rows:
+        entry = entries.get(row_user) or {
+            "user_id": row_user, "username": "", "puzzles_completed": 0, "average_time": 0
         }
-    ]
-    
-    users = await db.users.aggregate(pipeline).to_list(1000)
-    
-    leaderboard = []
-    for user in users:
-        entry = LeaderboardEntry(
-            user_id=user["id"],
-            username=user["username"],
-            total_score=user.get("category_score", 0),
-            puzzles_completed=user.get("category_completed", 0),
-            average_time=0  # Can be calculated if needed
-        )
-        leaderboard.append(entry)
+        # Score comes from the index so ranks and scores stay consistent
+        ranked_entries.append(RankedLeaderboardEntry(**{**entry, "total_score": score, "rank": row_rank}))
     
-    return leaderboard
+    return LeaderboardRank(
+        user_id=user_id,
+        rank=rank,
+        total_users=len(board),
+        entry=ranked_entries[len(above)],
+        above=ranked_entries[:len(above)],
+        below=ranked_entries[len(above) + 1:]
+    )
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.get("/leaderboard/global/rank/{user_id}", response_model=LeaderboardRank)
+async def get_global_rank(user_id: str, neighbors: int = Query(5, ge=0, le=100)):
+    """A user's global rank plus the users just above and below them"""
+    return await get_leaderboard_rank(user_id, neighbors)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.get("/leaderboard/category/{category}/rank/{user_id}", response_model=LeaderboardRank)
+async def get_category_rank(category: str, user_id: str, neighbors: int = Query(5, ge=0, le=100)):
+    """A user's rank within a category plus their neighbours"""
+    return await get_leaderboard_rank(user_id, neighbors, category)
 
 # Configure logging
 logging.basicConfig(
@@ -544,6 +1122,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect Mongo and start the background services; stop them on shutdown"""
+    started = time.perf_counter()
+    db.connect(os.environ['MONGO_URL'], os.environ['DB_NAME'], event_listeners=[MongoCommandMetrics(metrics)])
+    await ensure_indexes(db)
+    await image_dedup.load()
+    if os.environ.get('IMAGE_POOL_ENABLED', 'true').lower() == 'true':
+        image_pool.start()
+    auth_client.open()
+    await rank_index.start()
+    derivatives.start()
+    user_stats_buffer.start()
+    await generation_jobs.start()
+    app_startup_seconds.set("lifespan", value=time.perf_counter() - started)
+    logger.info(f"Started in {time.perf_counter() - started:.3f}s with image provider {image_provider.name}")
+    try:
+        yield
+    finally:
+        await generation_jobs.stop()
+        await user_stats_buffer.stop()
+        await image_pool.stop()
+        await rank_index.stop()
+        await auth_client.aclose()
+        await image_provider.aclose()
+        derivatives.shutdown()
+        db.close()
+
+def create_app() -> FastAPI:
+    """Build the ASGI app. Importing this module does no I/O; `lifespan` does"""
+    started = time.perf_counter()
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(api_router)
+    app.add_api_route("/metrics", get_metrics, include_in_schema=False)
+
+    # MessagePack/CBOR for clients that ask; inside the metrics middleware so it is timed
+    app.add_middleware(ContentNegotiationMiddleware, prefix=api_router.prefix)
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app_startup_seconds.set("create_app", value=time.perf_counter() - started)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,58 @@
+"""Single-flight coalescing of concurrent identical async calls."""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its result.
+
+    Callers that arrive while a call for their key is in flight wait for it
+    instead of starting their own. At most `max_waiters` callers attach to
+    one flight; the next caller starts a fresh flight that later arrivals
+    join instead, so one slow upstream call cannot hold an unbounded crowd.
+    The call runs as its own task, so a caller that disconnects does not
+    cancel it for everyone else. Errors are shared like results.
+    """
+
+    def __init__(self, max_waiters: int = 32):
+        self.max_waiters = max_waiters
+        self._flights: Dict[Hashable, _Flight] = {}
+        # saved_calls: callers that attached to a flight instead of calling upstream
+        self.stats = {"calls": 0, "executions": 0, "saved_calls": 0, "overflows": 0, "errors": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.stats["calls"] += 1
+        flight = self._flights.get(key)
+        if flight is not None and flight.waiters < self.max_waiters:
+            flight.waiters += 1
+            self.stats["saved_calls"] += 1
+        else:
+            if flight is not None:
+                self.stats["overflows"] += 1
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            self.stats["executions"] += 1
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+        return await asyncio.shield(flight.task)
+
+    def _finish(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Retrieve the exception even if every caller went away
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            self.stats["errors"] += 1
+
+    def report(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "max_waiters": self.max_waiters,
+            **self.stats,
+        }
@@ -0,0 +1,157 @@
+"""Server-side jigsaw cutting: one sprite atlas plus a compact geometry index.
+
+Images are normalized to a square canvas and cut into a grid x grid board.
+Every piece is a square sprite of `cell + 2 * pad` pixels whose alpha channel
+carries the tab/blank outline. Edge shapes come from per-grid-size mask
+templates that are computed once and shared by every image.
+"""
+import asyncio
+import functools
+import io
+import math
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+from PIL import Image
+
+CANVAS_SIZE = 1024
+TAB_RADIUS = 0.2  # Relative to the cell size
+TAB_OFFSET = 0.5  # Tab centre distance past the edge, relative to the radius
+
+# Side order used by templates and edge arrays
+TOP, RIGHT, BOTTOM, LEFT = range(4)
+
+# Piece counts a board can be cut into, as advertised by /puzzles/difficulties;
+# each one owns a mask template, a cut document and an atlas blob per image,
+# so the set must stay closed
+SUPPORTED_DIFFICULTIES = (9, 16, 25, 36, 49, 64)
+
+
+def grid_for_difficulty(difficulty: int) -> int:
+    """Difficulty levels are piece counts of a square board (9 -> 3x3)"""
+    if difficulty not in SUPPORTED_DIFFICULTIES:
+        levels = ", ".join(map(str, SUPPORTED_DIFFICULTIES))
+        raise ValueError(f"Difficulty {difficulty} is not supported (expected one of {levels})")
+    return math.isqrt(difficulty)
+
+
+class MaskTemplates(NamedTuple):
+    cell: int
+    pad: int
+    sprite: int
+    rect: np.ndarray  # (S, S) piece body
+    tabs: np.ndarray  # (4, S, S) disks added for a tab on each side
+    blanks: np.ndarray  # (4, S, S) disks removed for a blank on each side
+
+
+@functools.lru_cache(maxsize=len(SUPPORTED_DIFFICULTIES))
+def mask_templates(grid: int) -> MaskTemplates:
+    cell = CANVAS_SIZE // grid
+    radius = cell * TAB_RADIUS
+    offset = radius * TAB_OFFSET
+    pad = math.ceil(radius + offset) + 1
+    sprite = cell + 2 * pad
+
+    yy, xx = np.ogrid[:sprite, :sprite]
+    near, far, mid = pad, pad + cell, pad + cell / 2
+
+    def disk(cy, cx):
+        return (yy - cy) ** 2 + (xx - cx) ** 2 <= radius ** 2
+
+    rect = (yy >= near) & (yy < far) & (xx >= near) & (xx < far)
+    tabs = np.stack([
+        disk(near - offset, mid), disk(mid, far + offset),
+        disk(far + offset, mid), disk(mid, near - offset),
+    ])
+    blanks = np.stack([
+        disk(near + offset, mid), disk(mid, far - offset),
+        disk(far - offset, mid), disk(mid, near + offset),
+    ])
+    return MaskTemplates(cell, pad, sprite, rect, tabs, blanks)
+
+
+def random_edges(grid: int, seed: int) -> np.ndarray:
+    """(grid, grid, 4) array of +1 tab / -1 blank / 0 flat, matched between neighbours"""
+    rng = np.random.default_rng(seed)
+    edges = np.zeros((grid, grid, 4), dtype=np.int8)
+    horizontal = rng.choice(np.array([-1, 1], dtype=np.int8), size=(grid, grid - 1))
+    vertical = rng.choice(np.array([-1, 1], dtype=np.int8), size=(grid - 1, grid))
+    edges[:, :-1, RIGHT] = horizontal
+    edges[:, 1:, LEFT] = -horizontal
+    edges[:-1, :, BOTTOM] = vertical
+    edges[1:, :, TOP] = -vertical
+    return edges
+
+
+def cut_pieces(image: bytes, grid: int, seed: int, atlas_format: str = "WEBP"):
+    """Cut `image` into a sprite atlas; returns (atlas_bytes, geometry)"""
+    t = mask_templates(grid)
+    side = t.cell * grid
+    rgb = np.asarray(Image.open(io.BytesIO(image)).convert("RGB").resize((side, side), Image.LANCZOS))
+    padded = np.pad(rgb, ((t.pad, t.pad), (t.pad, t.pad), (0, 0)), mode="edge")
+
+    # (grid, grid, S, S, 3) views of every piece's sprite window, no copies
+    windows = np.lib.stride_tricks.sliding_window_view(padded, (t.sprite, t.sprite, 3))
+    windows = windows[::t.cell, ::t.cell, 0]
+
+    edges = random_edges(grid, seed)
+    tabs = ((edges == 1)[..., None, None] & t.tabs).any(axis=2)
+    blanks = ((edges == -1)[..., None, None] & t.blanks).any(axis=2)
+    alpha = ((t.rect | tabs) & ~blanks).astype(np.uint8) * 255
+
+    pieces = np.concatenate([windows, alpha[..., None]], axis=-1)
+    atlas = pieces.transpose(0, 2, 1, 3, 4).reshape(grid * t.sprite, grid * t.sprite, 4)
+
+    buf = io.BytesIO()
+    Image.fromarray(atlas, "RGBA").save(buf, atlas_format, quality=90)
+    geometry = {
+        "grid": grid,
+        "canvas": side,
+        "cell": t.cell,
+        "pad": t.pad,
+        "sprite": t.sprite,
+        "atlas": [atlas.shape[1], atlas.shape[0]],
+        # Row-major [top, right, bottom, left]; piece i sits at atlas cell
+        # (i % grid, i // grid) and on the board at (col * cell - pad, row * cell - pad)
+        "edges": edges.reshape(-1, 4).tolist(),
+    }
+    return buf.getvalue(), geometry
+
+
+class PieceCutter:
+    """Caches cut sets per (image hash, difficulty) in memory, Mongo and the blob store."""
+
+    def __init__(self, collection, blob_store, cache_size: int = 128):
+        self.collection = collection
+        self.blob_store = blob_store
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, dict]" = OrderedDict()
+
+    def _remember(self, key: tuple, cut: dict):
+        self._cache[key] = cut
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def get_cut(self, image_hash: str, difficulty: int) -> dict:
+        """Return {"atlas_hash", "geometry"}, cutting the image on first use"""
+        key = (image_hash, difficulty)
+        cut: Optional[dict] = self._cache.get(key)
+        if cut is None:
+            cut = await self.collection.find_one(
+                {"image_hash": image_hash, "difficulty": difficulty},
+                {"_id": 0, "atlas_hash": 1, "geometry": 1}
+            )
+        if cut is None:
+            grid = grid_for_difficulty(difficulty)
+            image = await self.blob_store.read(image_hash)
+            atlas, geometry = await asyncio.to_thread(cut_pieces, image, grid, int(image_hash[:16], 16))
+            cut = {"atlas_hash": await self.blob_store.put(atlas, "image/webp"), "geometry": geometry}
+            await self.collection.update_one(
+                {"image_hash": image_hash, "difficulty": difficulty},
+                {"$set": cut},
+                upsert=True
+            )
+        self._remember(key, cut)
+        return cut
@@ -0,0 +1,105 @@
+"""Per-user statistics bucketed by difficulty and category."""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+# Lower edges of the score histogram buckets
+SCORE_BUCKETS = (0, 100, 200, 300, 400, 500, 750, 1000)
+
+
+def score_bucket(score: int) -> str:
+    return str(SCORE_BUCKETS[max(0, bisect_right(SCORE_BUCKETS, score) - 1)])
+
+
+def bucket_summary(bucket: dict) -> dict:
+    """Add averages to a stored bucket and fill in empty histogram bins"""
+    count = bucket.get("count", 0)
+    histogram = bucket.get("histogram", {})
+    return {
+        **bucket,
+        "average_time": bucket.get("total_time", 0) / count if count else 0,
+        "average_score": bucket.get("total_score", 0) / count if count else 0,
+        "histogram": {str(edge): histogram.get(str(edge), 0) for edge in SCORE_BUCKETS},
+    }
+
+
+class UserStatsStore:
+    """One `user_stats` document per user, kept up to date with $inc/$min/$max.
+
+    Each difficulty and category gets a bucket with its completion count,
+    score and time sums, best/worst time, best score and a score histogram,
+    so the profile screen reads a single document.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.user_stats
+
+    async def record_many(self, progress: List[dict]):
+        """Fold progress rows (user_id, difficulty, category, score, time_taken) into the stats"""
+        updates = {}
+        for row in progress:
+            update = updates.setdefault(row["user_id"], {"$inc": defaultdict(int), "$min": {}, "$max": {}})
+            paths = [f"difficulty.{row['difficulty']}"]
+            category = row.get("category")
+            # Category names become field names; skip any Mongo would reject
+            if category and "." not in category and not category.startswith("$"):
+                paths.append(f"category.{category}")
+            for path in paths:
+                inc = update["$inc"]
+                inc[f"{path}.count"] += 1
+                inc[f"{path}.total_score"] += row["score"]
+                inc[f"{path}.total_time"] += row["time_taken"]
+                inc[f"{path}.histogram.{score_bucket(row['score'])}"] += 1
+                low, high = update["$min"], update["$max"]
+                low[f"{path}.best_time"] = min(low.get(f"{path}.best_time", row["time_taken"]), row["time_taken"])
+                high[f"{path}.worst_time"] = max(high.get(f"{path}.worst_time", row["time_taken"]), row["time_taken"])
+                high[f"{path}.best_score"] = max(high.get(f"{path}.best_score", row["score"]), row["score"])
+
+        if not updates:
+            return
+        now = datetime.now(timezone.utc)
+        await self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"user_id": user_id},
+                    {"$inc": dict(update["$inc"]), "$min": update["$min"], "$max": update["$max"],
+                     "$set": {"updated_at": now}},
+                    upsert=True
+                )
+                for user_id, update in updates.items()
+            ],
+            ordered=False
+        )
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        doc = await self.collection.find_one({"user_id": user_id}, {"_id": 0})
+        if doc is None:
+            return None
+        return {
+            "user_id": user_id,
+            "difficulty": {key: bucket_summary(b) for key, b in doc.get("difficulty", {}).items()},
+            "category": {key: bucket_summary(b) for key, b in doc.get("category", {}).items()},
+            "updated_at": doc.get("updated_at"),
+        }
+
+    async def rebuild(self, batch_size: int = 1000) -> int:
+        """Recompute every stats document from user_progress.
+
+        Completions recorded while the rebuild runs may be counted twice or
+        lost, so run it during a quiet period.
+        """
+        await self.collection.delete_many({})
+        batch, rows = [], 0
+        projection = {"_id": 0, "user_id": 1, "difficulty": 1, "category": 1, "score": 1, "time_taken": 1}
+        async for row in self.db.user_progress.find({}, projection).batch_size(batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await self.record_many(batch)
+                rows += len(batch)
+                batch = []
+        await self.record_many(batch)
+        return rows + len(batch)
@@ -0,0 +1,184 @@
+"""Write-behind buffer that coalesces `$inc` updates into batched bulk writes."""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# off:   write through immediately, one bulk_write per call
+# async: return at once; deltas are lost if the process dies before a flush
+# ack:   group commit; callers wait until the flush holding their delta lands
+DURABILITY_MODES = ("off", "async", "ack")
+
+
+class WriteBehindBuffer:
+    """Sums per-document `$inc` deltas in memory and flushes them together.
+
+    A flush runs when `max_pending` distinct documents are waiting or
+    `flush_interval` seconds have passed, whichever comes first, and sends a
+    single unordered bulk_write with one UpdateOne per document. A failed
+    flush puts its deltas back so the next flush retries them, except in ack
+    mode: there the waiting callers get the error and the deltas are
+    dropped, so a caller that retries is not counted twice. `on_flush` is
+    called with the keys written by every successful flush.
+    """
+
+    def __init__(
+        self,
+        collection,
+        key_field: str,
+        durability: str = "async",
+        max_pending: int = 1000,
+        flush_interval: float = 1.0,
+        on_flush: Optional[Callable[[List[str]], None]] = None,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {', '.join(DURABILITY_MODES)}")
+        self.collection = collection
+        self.key_field = key_field
+        self.durability = durability
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._pending: Dict[str, Dict[str, int]] = {}
+        self._waiters: List[asyncio.Future] = []
+        self._latencies = deque(maxlen=256)
+        self.stats = {
+            "updates": 0, "coalesced": 0, "flushes": 0, "flushed_documents": 0, "errors": 0, "dropped_documents": 0
+        }
+        self._lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        """Documents with deltas waiting to be flushed"""
+        return len(self._pending)
+
+    def _merge(self, increments: Dict[str, dict]):
+        for key, inc in increments.items():
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = dict(inc)
+                continue
+            self.stats["coalesced"] += 1
+            for field, delta in inc.items():
+                pending[field] = pending.get(field, 0) + delta
+
+    async def increment_many(self, increments: Dict[str, dict]):
+        """Queue `{key: {field: delta}}`; how long this waits depends on durability"""
+        if not increments:
+            return
+        self.stats["updates"] += len(increments)
+        if self.durability == "off":
+            await self._write(increments)
+            self._notify(list(increments))
+            return
+
+        self._merge(increments)
+        if self._task is None:
+            # Not started (scripts, tests): behave like write-through
+            await self.flush()
+            return
+        waiter = None
+        if self.durability == "ack":
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+        if waiter is not None:
+            await waiter
+
+    async def _write(self, batch: Dict[str, dict]):
+        await self.collection.bulk_write(
+            [UpdateOne({self.key_field: key}, {"$inc": inc}) for key, inc in batch.items()],
+            ordered=False
+        )
+
+    def _notify(self, keys: Iterable[str]):
+        if self.on_flush is not None:
+            self.on_flush(list(keys))
+
+    async def flush(self):
+        """Write everything buffered so far"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            waiters, self._waiters = self._waiters, []
+            started = time.monotonic()
+            try:
+                await self._write(batch)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Write-behind flush of {len(batch)} documents failed: {e}")
+                if self.durability == "ack":
+                    # Every delta has a caller that is told it failed
+                    self.stats["dropped_documents"] += len(batch)
+                else:
+                    self._merge(batch)
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                if not waiters:
+                    raise
+                return
+            self._latencies.append(time.monotonic() - started)
+            self.stats["flushes"] += 1
+            self.stats["flushed_documents"] += len(batch)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+        self._notify(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(f"Write-behind flush loop error: {e}")
+
+    def start(self):
+        if self.durability != "off" and self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # Shutdown carries on; the deltas are lost with the process
+            logger.error(f"Final write-behind flush failed, {len(self._pending)} documents not written: {e}")
+
+    def report(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            "durability": self.durability,
+            "depth": len(self._pending),
+            "waiters": len(self._waiters),
+            "max_pending": self.max_pending,
+            "flush_interval_seconds": self.flush_interval,
+            **self.stats,
+            "last_flush_ms": round(self._latencies[-1] * 1000, 2) if latencies else None,
+            "p50_flush_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            "max_flush_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+        }
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Query Plan Testing for the Jigsaw Puzzle Game backend
+Ensures the declared indexes and explain()s every endpoint query shape,
+failing if any of them falls back to a collection scan (COLLSCAN)
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+load_dotenv(BACKEND_DIR / ".env")
+
+from indexes import INDEXES, QUERY_SHAPES, ensure_indexes, explain_query_shapes  # noqa: E402
+
+# Scratch database, dropped after the run
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+TEST_DB_NAME = f"{os.environ.get('DB_NAME', 'test_database')}_index_test"
+
+
+class QueryPlanTester:
+    def __init__(self, db):
+        self.db = db
+        self.results = {}
+
+    def log_result(self, test_name, status, details):
+        """Log test result"""
+        self.results[test_name] = {"status": status, "details": details}
+        print(f"[{status.upper()}] {test_name}: {details}")
+
+    async def seed(self):
+        """Insert a few documents so the planner has real candidate plans"""
+        now = datetime.now(timezone.utc)
+        for collection in INDEXES:
+            # Lease documents are unique per category
+            category = "animals" if collection != "image_pool_leases" else None
+            docs = [{
+                "id": f"doc-{i}", "user_id": f"user-{i}", "email": f"user{i}@example.com",
+                "session_token": f"token-{i}", "expires_at": now, "completed_at": now,
+                "created_at": now, "uploadDate": now, "filename": f"hash-{i}",
+                "puzzle_id": f"puzzle-{i}", "category": category or f"category-{i}", "difficulty": 9,
+                "image_hash": f"hash-{i}", "variant": "thumb", "format": "webp",
+                "total_score": i,
+            } for i in range(20)]
+            await self.db[collection].insert_many(docs)
+
+    async def run_all_tests(self):
+        """Explain every query shape and report its winning plan"""
+        print("🧩 Starting Jigsaw Puzzle Game Query Plan Testing")
+        print(f"MongoDB: {MONGO_URL} / {TEST_DB_NAME}")
+        print("=" * 60)
+
+        await ensure_indexes(self.db)
+        await self.seed()
+        plans = await explain_query_shapes(self.db)
+
+        for name, _, _, _ in QUERY_SHAPES:
+            stages = plans[name]
+            if "COLLSCAN" in stages:
+                self.log_result(name, "fail", f"Collection scan: {' <- '.join(stages)}")
+            else:
+                self.log_result(name, "pass", " <- ".join(stages))
+
+        failed = [name for name, result in self.results.items() if result["status"] == "fail"]
+        print(f"\nOverall: {len(self.results) - len(failed)}/{len(self.results)} query shapes use an index")
+        return not failed
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL)
+    await client.drop_database(TEST_DB_NAME)
+    try:
+        return await QueryPlanTester(client[TEST_DB_NAME]).run_all_tests()
+    finally:
+        await client.drop_database(TEST_DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
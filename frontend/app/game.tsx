@@ -75,7 +75,7 @@ export default function GameScreen() {
       const puzzleData = await response.json();
       
       if (response.ok) {
-        setPuzzleImage(puzzleData.image_base64);
+        setPuzzleImage(`${EXPO_PUBLIC_BACKEND_URL}${puzzleData.image_url}`);
         setGameStarted(true);
         startTimer();
       } else {
@@ -176,7 +176,7 @@ export default function GameScreen() {
           {puzzleImage && (
             <View style={styles.imageContainer}>
               <Image
-                source={{ uri: `data:image/png;base64,${puzzleImage}` }}
+                source={{ uri: puzzleImage }}
                 style={styles.puzzleImage}
                 resizeMode="contain"
               />
@@ -29,6 +29,8 @@ interface UserProgress {
   progress: any[];
   total_score: number;
   puzzles_completed: number;
+  average_time: number;
+  next_cursor: string | null;
 }
 
 export default function ProfileScreen() {
@@ -59,7 +61,7 @@ export default function ProfileScreen() {
 
   const fetchUserProgress = async (userId: string) => {
     try {
-      const response = await fetch(`${EXPO_PUBLIC_BACKEND_URL}/api/progress/user/${userId}`);
+      const response = await fetch(`${EXPO_PUBLIC_BACKEND_URL}/api/progress/user/${userId}?limit=5`);
       const data = await response.json();
       
       if (response.ok) {
@@ -94,10 +96,7 @@ export default function ProfileScreen() {
   };
 
   const calculateAverageTime = () => {
-    if (!userProgress?.progress || userProgress.progress.length === 0) return 0;
-    
-    const totalTime = userProgress.progress.reduce((sum, p) => sum + p.time_taken, 0);
-    return Math.round(totalTime / userProgress.progress.length);
+    return Math.round(userProgress?.average_time || 0);
   };
 
   const formatTime = (seconds: number) => {
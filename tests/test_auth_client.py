@@ -0,0 +1,160 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from auth_client import AuthServiceError, CircuitBreaker, CircuitOpenError, EmergentAuthClient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the breaker's clock; the event loop keeps the real one
+    monkeypatch.setattr("auth_client.time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_a_single_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+
+def test_failed_trial_reopens_and_successful_trial_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def client_for(handler, breaker):
+    client = EmergentAuthClient(url="http://auth.test/session", breaker=breaker)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def half_open_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    return breaker
+
+
+def test_session_data_records_response_outcomes(clock):
+    statuses = iter([200, 401, 503])
+
+    def handler(request):
+        assert request.headers["X-Session-ID"] == "s"
+        return httpx.Response(next(statuses), json={"id": "u"})
+
+    breaker = CircuitBreaker(failure_threshold=1)
+    client = client_for(handler, breaker)
+    assert asyncio.run(client.session_data("s")) == {"id": "u"}
+    assert asyncio.run(client.session_data("s")) is None
+    assert breaker.state == "closed"
+    with pytest.raises(AuthServiceError):
+        asyncio.run(client.session_data("s"))
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(client.session_data("s"))
+
+
+@pytest.mark.parametrize("error", [httpx.ConnectTimeout("slow"), httpx.ConnectError("refused")])
+def test_upstream_errors_count_as_failures(clock, error):
+    def handler(request):
+        raise error
+
+    breaker = half_open_breaker(clock)
+    client = client_for(handler, breaker)
+    with pytest.raises(AuthServiceError):
+        asyncio.run(client.session_data("s"))
+    assert breaker.state == "open"
+    assert client._semaphore._value == 20
+
+
+def test_malformed_200_bodies_count_as_failures(clock):
+    breaker = half_open_breaker(clock)
+    client = client_for(lambda request: httpx.Response(200, content=b"<html>"), breaker)
+    with pytest.raises(AuthServiceError):
+        asyncio.run(client.session_data("s"))
+    assert breaker.state == "open"
+
+
+@pytest.mark.parametrize("error", [httpx.InvalidURL("bad url"), asyncio.CancelledError()])
+def test_local_errors_release_the_trial_without_a_verdict(clock, error):
+    def handler(request):
+        raise error
+
+    breaker = half_open_breaker(clock)
+    client = client_for(handler, breaker)
+    with pytest.raises(type(error)):
+        asyncio.run(client.session_data("s"))
+    assert breaker.state == "half_open"
+    assert client._semaphore._value == 20
+    assert breaker.allow()
+
+
+def test_local_saturation_does_not_open_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=1)
+    client = client_for(lambda request: httpx.Response(200, json={}), breaker)
+    client.timeout = 0.01
+
+    async def saturated():
+        client._semaphore = asyncio.Semaphore(0)
+        for _ in range(3):
+            with pytest.raises(AuthServiceError):
+                await client.session_data("s")
+
+    asyncio.run(saturated())
+    assert breaker.state == "closed"
+
+
+def test_trial_slot_is_released_when_the_connection_wait_times_out(clock):
+    breaker = half_open_breaker(clock)
+    client = client_for(lambda request: httpx.Response(200, json={}), breaker)
+    client.timeout = 0.01
+    client._semaphore = asyncio.Semaphore(0)
+    with pytest.raises(AuthServiceError):
+        asyncio.run(client.session_data("s"))
+    assert breaker.allow()
@@ -0,0 +1,107 @@
+import msgpack
+import pytest
+from fastapi import APIRouter, Body, FastAPI, Response
+from fastapi.testclient import TestClient
+
+from content_negotiation import CBOR, JSON, MSGPACK, ContentNegotiationMiddleware, negotiate
+from metrics import MetricsMiddleware, MetricsRegistry
+
+
+@pytest.mark.parametrize("accept, codec", [
+    (None, JSON),
+    ("*/*", JSON),
+    ("application/msgpack", MSGPACK),
+    ("application/json;q=0.5, application/cbor", CBOR),
+    ("application/cbor;q=0.2, application/x-msgpack;q=0.9", MSGPACK),
+    ("application/msgpack, application/cbor", MSGPACK),
+    ("application/msgpack;q=oops, application/json;q=0.1", JSON),
+])
+def test_negotiate(accept, codec):
+    assert negotiate(accept) is codec
+
+
+@pytest.fixture
+def app():
+    registry = MetricsRegistry()
+    router = APIRouter(prefix="/api")
+
+    @router.post("/echo")
+    async def echo(document: dict = Body(...)):
+        return document
+
+    @router.api_route("/thing", methods=["GET", "HEAD"])
+    async def thing():
+        return Response(b'{"image_base64":"aGk="}', media_type="application/json", headers={"ETag": '"v1"'})
+
+    @router.get("/blob")
+    async def blob():
+        return Response(b"\x89PNG", media_type="image/png", headers={"ETag": '"b1"'})
+
+    @router.get("/fresh")
+    async def fresh():
+        return Response(status_code=304, headers={"ETag": '"v1"'})
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(ContentNegotiationMiddleware, prefix="/api")
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    app.state.registry = registry
+    return app
+
+
+def test_binary_request_and_response_bodies(app):
+    client = TestClient(app)
+    response = client.post(
+        "/api/echo",
+        content=msgpack.packb({"a": [1, 2]}),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == {"a": [1, 2]}
+
+
+def test_base64_fields_travel_as_bytes_with_a_codec_etag(app):
+    response = TestClient(app).get("/api/thing", headers={"Accept": "application/msgpack"})
+    assert msgpack.unpackb(response.content) == {"image_base64": b"hi"}
+    assert response.headers["etag"] == '"v1-msgpack"'
+    assert "Accept" in response.headers["vary"]
+
+
+def test_head_responses_are_not_transcoded(app):
+    client = TestClient(app)
+    head = client.head("/api/thing", headers={"Accept": "application/msgpack"})
+    assert head.status_code == 200
+    assert head.headers["content-length"] == str(len(b'{"image_base64":"aGk="}'))
+    assert head.headers["content-type"] == "application/json"
+
+
+def test_untranscoded_responses_keep_their_etag(app):
+    client = TestClient(app)
+    accept = {"Accept": "application/msgpack"}
+    assert client.get("/api/blob", headers=accept).headers["etag"] == '"b1"'
+    assert client.head("/api/thing", headers=accept).headers["etag"] == '"v1"'
+
+
+def test_not_modified_echoes_the_representation_revalidated(app):
+    client = TestClient(app)
+    accept = {"Accept": "application/msgpack"}
+    binary = client.get("/api/fresh", headers={**accept, "If-None-Match": '"v1-msgpack"'})
+    assert binary.status_code == 304
+    assert binary.headers["etag"] == '"v1-msgpack"'
+    plain = client.get("/api/fresh", headers={**accept, "If-None-Match": '"v1"'})
+    assert plain.headers["etag"] == '"v1"'
+
+
+def test_rewritten_requests_keep_their_route_label(app):
+    client = TestClient(app)
+    client.post(
+        "/api/echo",
+        content=msgpack.packb({"a": 1}),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+    )
+    client.get("/api/thing", headers={"Accept": "application/msgpack", "If-None-Match": '"v1-msgpack"'})
+    rendered = app.state.registry.render()
+    assert 'route="/api/echo"' in rendered
+    assert 'route="/api/thing"' in rendered
+    assert "unmatched" not in rendered
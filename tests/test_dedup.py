@@ -0,0 +1,72 @@
+import io
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from dedup import BKTree, dhash, hamming, phash
+
+
+def test_hamming():
+    assert hamming(0, 0) == 0
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(2 ** 64 - 1, 0) == 64
+
+
+@pytest.mark.parametrize("radius", [0, 3, 10])
+def test_bktree_search_matches_brute_force(radius):
+    rng = random.Random(radius)
+    fingerprints = [rng.getrandbits(16) for _ in range(300)]
+    # Exact repeats share a node
+    fingerprints += fingerprints[:20]
+    tree = BKTree()
+    for i, fingerprint in enumerate(fingerprints):
+        tree.add(fingerprint, f"k{i}")
+    assert len(tree) == len(fingerprints)
+    for _ in range(50):
+        query = rng.getrandbits(16)
+        expected = sorted(
+            (hamming(query, fingerprint), f"k{i}")
+            for i, fingerprint in enumerate(fingerprints)
+            if hamming(query, fingerprint) <= radius
+        )
+        assert sorted(tree.search(query, radius)) == expected
+        assert tree.nearest(query, radius) == (expected[0] if expected else None)
+
+
+def test_empty_bktree():
+    tree = BKTree()
+    assert list(tree.search(0, 64)) == []
+    assert tree.nearest(0, 64) is None
+
+
+def encode(pixels, fmt="PNG", **options):
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+def picture(seed):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    return np.asarray(Image.fromarray(small).resize((256, 256), Image.BICUBIC))
+
+
+@pytest.mark.parametrize("algorithm", [phash, dhash])
+def test_hashes_survive_reencoding_and_resizing(algorithm):
+    pixels = picture(1)
+    original = algorithm(encode(pixels))
+    assert algorithm(encode(pixels)) == original
+    assert hamming(original, algorithm(encode(pixels, "JPEG", quality=60))) <= 6
+    resized = np.asarray(Image.fromarray(pixels).resize((180, 180), Image.BILINEAR))
+    assert hamming(original, algorithm(encode(resized))) <= 6
+
+
+@pytest.mark.parametrize("algorithm", [phash, dhash])
+def test_hashes_separate_different_pictures(algorithm):
+    hashes = [algorithm(encode(picture(seed))) for seed in range(5)]
+    for i in range(len(hashes)):
+        for j in range(i + 1, len(hashes)):
+            assert hamming(hashes[i], hashes[j]) > 10
+    assert all(0 <= h < 2 ** 64 for h in hashes)
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from blob_store import LocalDiskBlobStore
+from http_cache import StaticPayload, etag_matches
+from image_providers import ProceduralImageProvider
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ('"abcd"', False),
+    ("*", True),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(header, '"abc"') is matches
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = AsyncMongoMockClient().db
+    asyncio.run(db.puzzles.insert_one({
+        "id": "p1", "title": "Cat", "category": "animals", "difficulty": 9, "language": "en",
+        "image_hash": "h" * 64, "created_at": datetime(2026, 1, 2, 3, 4, 5),
+    }))
+    monkeypatch.setattr(server.db, "_db", db)
+    monkeypatch.setattr(server, "puzzle_responses", server.SerializedCache(8))
+    # No lifespan: nothing but the patched database is needed
+    return TestClient(server.app)
+
+
+def test_puzzle_revalidates_with_its_etag(client):
+    first = client.get("/api/puzzles/p1")
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == server.IMMUTABLE
+    assert first.headers["last-modified"] == "Fri, 02 Jan 2026 03:04:05 GMT"
+    again = client.get("/api/puzzles/p1", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+    since = client.get("/api/puzzles/p1", headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert since.status_code == 304
+
+
+@pytest.mark.parametrize("if_none_match", ["*", '"missing"'])
+def test_missing_puzzles_are_never_not_modified(client, if_none_match):
+    response = client.get("/api/puzzles/missing", headers={"If-None-Match": if_none_match})
+    assert response.status_code == 404
+
+
+def test_static_payloads_use_a_content_etag_only():
+    payload = StaticPayload([{"level": 9}])
+    assert payload.etag == StaticPayload([{"level": 9}]).etag
+    assert payload.etag != StaticPayload([{"level": 16}]).etag
+
+
+def test_static_lists_answer_304(client):
+    first = client.get("/api/puzzles/difficulties")
+    assert "last-modified" not in first.headers
+    again = client.get("/api/puzzles/difficulties", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_restoring_an_image_changes_the_puzzle_body_and_etag(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "blob_store", LocalDiskBlobStore(str(tmp_path)))
+    monkeypatch.setattr(server, "procedural_images", ProceduralImageProvider(size=64))
+    asyncio.run(server.db.puzzles.update_one({"id": "p1"}, {"$set": {"seed": 7}}))
+    before = client.get("/api/puzzles/p1")
+
+    puzzle = asyncio.run(server.db.puzzles.find_one({"id": "p1"}, {"_id": 0}))
+    key = asyncio.run(server.restore_procedural_image("p1", puzzle))
+
+    after = client.get("/api/puzzles/p1", headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.json()["image_hash"] == key != before.json()["image_hash"]
+    assert after.headers["etag"] != before.headers["etag"]
+
+
+def test_advertised_difficulties_are_the_cuttable_ones(client):
+    levels = client.get("/api/puzzles/difficulties").json()
+    assert [d["level"] for d in levels] == list(server.SUPPORTED_DIFFICULTIES)
+    assert levels[0] == {"level": 9, "name": "Easy", "pieces": "3x3"}
+    assert levels[-1] == {"level": 64, "name": "Extreme", "pieces": "8x8"}
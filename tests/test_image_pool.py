@@ -0,0 +1,41 @@
+import asyncio
+import io
+
+import numpy as np
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from PIL import Image
+
+import server
+from blob_store import LocalDiskBlobStore
+from dedup import ImageDeduplicator
+from image_pool import ImagePool
+from image_providers import GeneratedImage
+
+
+def jpeg(seed: int, quality: int = 90) -> bytes:
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(small).resize((256, 256), Image.BICUBIC).save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("policy", ["reuse", "reject"])
+def test_near_duplicate_refills_are_not_pooled(tmp_path, monkeypatch, policy):
+    db = AsyncMongoMockClient().db
+    blobs = LocalDiskBlobStore(str(tmp_path))
+    monkeypatch.setattr(server, "image_dedup", ImageDeduplicator(db.image_fingerprints, blobs, policy=policy))
+    # A fresh picture, then the same picture re-encoded twice
+    images = iter([jpeg(1), jpeg(1, quality=70), jpeg(1, quality=50)])
+
+    async def generate(category):
+        return GeneratedImage(next(images), "test", None)
+
+    pool = ImagePool(db.image_pool, blobs, generate, ["animals"], high_water=3,
+                     store=server.store_pool_image, max_discards=2)
+    asyncio.run(pool.refill_once())
+
+    assert asyncio.run(pool.depth("animals")) == 1
+    assert pool.stats["animals"]["generated"] == 1
+    assert pool.stats["animals"]["discarded"] == 2
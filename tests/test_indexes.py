@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from indexes import ensure_indexes
+
+
+class FailingDB:
+    def __init__(self):
+        self.attempted = []
+
+    def __getitem__(self, name):
+        return FailingCollection(self, name)
+
+
+class FailingCollection:
+    def __init__(self, db, name):
+        self.db, self.name = db, name
+
+    async def create_indexes(self, models):
+        self.db.attempted.append(self.name)
+        raise OperationFailure("E11000 duplicate key error")
+
+
+def test_failed_unique_index_aborts_startup():
+    db = FailingDB()
+    with pytest.raises(OperationFailure):
+        asyncio.run(ensure_indexes(db, ["user_progress"]))
+
+
+def test_failed_read_only_index_is_logged_and_skipped():
+    db = FailingDB()
+    asyncio.run(ensure_indexes(db, ["image_pool", "images.files"]))
+    assert db.attempted == ["image_pool", "images.files"]
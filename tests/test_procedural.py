@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+import procedural
+
+
+@pytest.mark.parametrize("category", list(procedural.STYLES) + ["other"])
+def test_render_is_a_pure_function_of_category_and_seed(category):
+    a = procedural.render_pixels(category, 1234, size=64)
+    assert a.shape == (64, 64, 3) and a.dtype == np.uint8
+    assert np.array_equal(a, procedural.render_pixels(category, 1234, size=64))
+    assert not np.array_equal(a, procedural.render_pixels(category, 1235, size=64))
+
+
+@pytest.mark.parametrize("size", [16, 17, 32, 34])
+def test_skyline_finishes_at_tiny_work_sizes(size):
+    image = procedural.skyline(np.random.default_rng(0), size, procedural.PALETTES["buildings"][0])
+    assert image.shape == (size, size, 3)
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from indexes import ensure_indexes
+from server import BatchProgressCreate, complete_puzzles_batch
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    db = AsyncMongoMockClient().db
+    asyncio.run(ensure_indexes(db, ["user_progress"]))
+    asyncio.run(db.puzzles.insert_one({"id": "p1", "category": "animals"}))
+    monkeypatch.setattr(server.db, "_db", db)
+    recorded = []
+
+    async def record_completions(progress):
+        recorded.extend(progress)
+
+    monkeypatch.setattr(server, "record_completions", record_completions)
+    return recorded
+
+
+def submit(*completion_ids):
+    batch = BatchProgressCreate(completions=[
+        {"completion_id": cid, "user_id": "u1", "puzzle_id": "p1", "time_taken": 100, "difficulty": 9}
+        for cid in completion_ids
+    ])
+    return asyncio.run(complete_puzzles_batch(batch))
+
+
+def test_resubmitted_completions_are_counted_once(recorded):
+    first = submit("c1", "c2")
+    assert first["accepted"] == 2 and first["duplicates"] == 0
+    assert first["total_score"] == 2 * server.calculate_score(9, 100)
+
+    # A retry after a lost response, plus one new completion
+    retry = submit("c1", "c2", "c3")
+    assert retry["accepted"] == 1 and retry["duplicates"] == 2
+    assert retry["total_score"] == server.calculate_score(9, 100)
+    assert set(retry["scores"]) == {"c1", "c2", "c3"}
+
+    assert [row["id"] for row in recorded] == ["c1", "c2", "c3"]
+    assert recorded[0]["category"] == "animals"
+    count = asyncio.run(server.db.user_progress.count_documents({"user_id": "u1"}))
+    assert count == 3
+
+
+def test_repeated_ids_within_one_batch_are_collapsed(recorded):
+    response = submit("c1", "c1", "c1")
+    assert response["accepted"] == 1 and response["duplicates"] == 0
+    assert len(recorded) == 1
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from rank_index import IndexableSkipList, RankedBoard
+
+
+def assert_matches(skiplist, expected):
+    assert len(skiplist) == len(expected)
+    if expected:
+        assert list(skiplist.iter_from(0)) == expected
+    for i, key in enumerate(expected):
+        assert skiplist.index_of(key) == i
+        assert skiplist.at(i) == key
+        assert next(skiplist.iter_from(i)) == key
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_skiplist_matches_a_sorted_list_under_random_operations(seed):
+    rng = random.Random(seed)
+    random.seed(seed)  # Node levels
+    skiplist = IndexableSkipList()
+    expected = []
+    for _ in range(400):
+        if expected and rng.random() < 0.4:
+            key = rng.choice(expected)
+            skiplist.remove(key)
+            expected.remove(key)
+        else:
+            key = rng.randrange(10_000)
+            if key in expected:
+                continue
+            skiplist.insert(key)
+            expected.append(key)
+            expected.sort()
+        if rng.random() < 0.1:
+            assert_matches(skiplist, expected)
+    assert_matches(skiplist, expected)
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 37, 500])
+def test_from_sorted_matches_repeated_inserts(size):
+    random.seed(size)
+    keys = sorted(random.sample(range(10 * size + 1), size))
+    skiplist = IndexableSkipList.from_sorted(keys)
+    assert_matches(skiplist, keys)
+    # Widths built in bulk must survive later updates
+    for key in keys[::3]:
+        skiplist.remove(key)
+    skiplist.insert(-1)
+    assert_matches(skiplist, sorted([-1] + [k for i, k in enumerate(keys) if i % 3]))
+
+
+def test_skiplist_errors():
+    skiplist = IndexableSkipList.from_sorted([1, 2, 3])
+    with pytest.raises(KeyError):
+        skiplist.remove(4)
+    with pytest.raises(KeyError):
+        skiplist.index_of(0)
+    with pytest.raises(IndexError):
+        skiplist.at(3)
+    with pytest.raises(IndexError):
+        skiplist.at(-1)
+
+
+def brute_force_ranking(scores):
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def test_ranked_board_matches_a_brute_force_sort():
+    rng = random.Random(7)
+    scores = {f"u{i}": rng.randrange(100) for i in range(60)}
+    board = RankedBoard(scores)
+    for _ in range(300):
+        user_id = f"u{rng.randrange(80)}"
+        delta = rng.randrange(50)
+        board.increment(user_id, delta)
+        scores[user_id] = scores.get(user_id, 0) + delta
+    ranking = brute_force_ranking(scores)
+    assert len(board) == len(ranking)
+    for rank, (user_id, score) in enumerate(ranking, 1):
+        assert board.rank(user_id) == rank
+    rows = [(rank, user_id, score) for rank, (user_id, score) in enumerate(ranking, 1)]
+    assert board.window(1, len(rows)) == rows
+    assert board.window(10, 5) == rows[9:14]
+    assert board.window(len(rows), 10) == rows[-1:]
+    assert board.window(len(rows) + 1, 10) == []
+    assert board.window(1, 0) == []
+    assert board.rank("nobody") is None
+
+
+def test_ties_rank_by_user_id():
+    board = RankedBoard({"b": 5, "a": 5, "c": 9})
+    assert [board.rank(u) for u in "cab"] == [1, 2, 3]
+
+
+def test_around_clips_at_both_ends():
+    board = RankedBoard({f"u{i}": 100 - i for i in range(10)})
+    rank, above, below = board.around("u5", 2)
+    assert rank == 6
+    assert [row[1] for row in above] == ["u3", "u4"]
+    assert [row[1] for row in below] == ["u6", "u7"]
+
+    rank, above, below = board.around("u0", 3)
+    assert rank == 1 and above == []
+    assert [row[0] for row in below] == [2, 3, 4]
+
+    rank, above, below = board.around("u9", 3)
+    assert rank == 10 and below == []
+    assert [row[0] for row in above] == [7, 8, 9]
+
+    assert board.around("nobody", 3) is None
@@ -0,0 +1,102 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+from server import (
+    CATALOG_SORT,
+    PROGRESS_SORT,
+    decode_catalog_cursor,
+    decode_progress_cursor,
+    encode_catalog_cursor,
+    encode_progress_cursor,
+    parse_range_header,
+)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("items=0-10", None),
+    ("bytes=0-10,20-30", None),
+    ("bytes=abc-", None),
+    ("bytes=0-99", (0, 100)),
+    ("bytes=10-19", (10, 20)),
+    ("bytes=10-", (10, 100)),
+    ("bytes=90-500", (90, 100)),
+    ("bytes=-10", (90, 100)),
+    ("bytes=-500", (0, 100)),
+    ("bytes= 5-6", (5, 7)),
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=150-200", "bytes=20-10", "bytes=-0"])
+def test_unsatisfiable_ranges_are_416(header):
+    with pytest.raises(HTTPException) as error:
+        parse_range_header(header, 100)
+    assert error.value.status_code == 416
+    assert error.value.headers == {"Content-Range": "bytes */100"}
+
+
+def paginate(collection, sort, encode, decode, page_size):
+    """Walk a collection page by page the way the cursor endpoints do"""
+    async def walk():
+        seen, cursor = [], None
+        while True:
+            query = decode(cursor) if cursor else {}
+            page = await collection.find(query, {"_id": 0}).sort(sort).limit(page_size).to_list(None)
+            seen.extend(page)
+            if len(page) < page_size:
+                return seen
+            cursor = encode(page[-1])
+    return asyncio.run(walk())
+
+
+def test_catalog_cursor_pages_cover_the_sort_order_exactly_once():
+    collection = AsyncMongoMockClient().db.puzzles
+    base = datetime(2026, 1, 1)
+    docs = [
+        {
+            "id": f"p{i:03d}",
+            "category": ["animals", "food", "nature"][i % 3],
+            "difficulty": [9, 16, 25][i % 4 % 3],
+            # Repeated timestamps exercise the id tie-break
+            "created_at": base + timedelta(minutes=i // 5),
+        }
+        for i in range(70)
+    ]
+    asyncio.run(collection.insert_many([dict(doc) for doc in docs]))
+    expected = asyncio.run(collection.find({}, {"_id": 0}).sort(CATALOG_SORT).to_list(None))
+    for page_size in (1, 7, 70):
+        pages = paginate(collection, CATALOG_SORT, encode_catalog_cursor, decode_catalog_cursor, page_size)
+        assert [doc["id"] for doc in pages] == [doc["id"] for doc in expected]
+
+
+def test_progress_cursor_pages_cover_the_sort_order_exactly_once():
+    collection = AsyncMongoMockClient().db.user_progress
+    base = datetime(2026, 1, 1)
+    docs = [{"id": f"r{i:03d}", "completed_at": base + timedelta(seconds=i // 3)} for i in range(40)]
+    asyncio.run(collection.insert_many([dict(doc) for doc in docs]))
+    expected = sorted(docs, key=lambda doc: (doc["completed_at"], doc["id"]), reverse=True)
+    pages = paginate(collection, PROGRESS_SORT, encode_progress_cursor, decode_progress_cursor, 6)
+    assert [doc["id"] for doc in pages] == [doc["id"] for doc in expected]
+
+
+@pytest.mark.parametrize("decode", [decode_catalog_cursor, decode_progress_cursor])
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    "é",
+    base64.urlsafe_b64encode(b"{not json").decode(),
+    base64.urlsafe_b64encode(b"[1]").decode(),
+    base64.urlsafe_b64encode(b"42").decode(),
+    base64.urlsafe_b64encode(b'["a", 9, "yesterday", "p"]').decode(),
+])
+def test_malformed_cursors_are_400(decode, cursor):
+    with pytest.raises(HTTPException) as error:
+        decode(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "image"
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("k", fetch) for _ in range(10)))
+
+    assert asyncio.run(scenario()) == ["image"] * 10
+    assert len(calls) == 1
+    assert flights.stats["executions"] == 1 and flights.stats["saved_calls"] == 9
+    assert flights.report()["in_flight"] == 0
+
+
+def test_different_keys_and_later_calls_run_separately():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def scenario():
+        together = await asyncio.gather(flights.do("a", lambda: fetch("a")), flights.do("b", lambda: fetch("b")))
+        later = await flights.do("a", lambda: fetch("a"))
+        return together, later
+
+    assert asyncio.run(scenario()) == (["a", "b"], "a")
+    assert calls == ["a", "b", "a"]
+
+
+def test_waiters_beyond_the_cap_start_a_new_flight():
+    flights = SingleFlight(max_waiters=2)
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.gather(*(flights.do("k", fetch) for _ in range(7)))
+
+    asyncio.run(scenario())
+    # 1 + 2 waiters, 1 + 2 waiters, then 1 more
+    assert flights.stats["executions"] == 3
+    assert flights.stats["overflows"] == 2
+
+
+def test_errors_are_shared_and_not_cached():
+    flights = SingleFlight()
+    attempts = []
+
+    async def fail():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        results = await asyncio.gather(*(flights.do("k", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        with pytest.raises(RuntimeError):
+            await flights.do("k", fail)
+
+    asyncio.run(scenario())
+    assert len(attempts) == 2
+    assert flights.stats["errors"] == 2
+
+
+def test_a_cancelled_caller_does_not_cancel_the_flight():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def scenario():
+        leaver = asyncio.create_task(flights.do("k", fetch))
+        stayer = asyncio.create_task(flights.do("k", fetch))
+        await asyncio.sleep(0.005)
+        leaver.cancel()
+        return await stayer
+
+    assert asyncio.run(scenario()) == "done"
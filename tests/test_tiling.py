@@ -0,0 +1,34 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from tiling import SUPPORTED_DIFFICULTIES, cut_pieces, grid_for_difficulty, random_edges
+
+
+@pytest.mark.parametrize("difficulty", SUPPORTED_DIFFICULTIES)
+def test_supported_difficulties_map_to_square_grids(difficulty):
+    grid = grid_for_difficulty(difficulty)
+    assert grid * grid == difficulty
+
+
+@pytest.mark.parametrize("difficulty", [0, 1, 4, 10, 81, 100, 121, 1024 ** 2, 1025 ** 2, -9])
+def test_unsupported_difficulties_are_rejected(difficulty):
+    with pytest.raises(ValueError):
+        grid_for_difficulty(difficulty)
+
+
+def test_random_edges_match_between_neighbours():
+    edges = random_edges(5, seed=42)
+    assert (edges[:, :-1, 1] == -edges[:, 1:, 3]).all()
+    assert (edges[:-1, :, 2] == -edges[1:, :, 0]).all()
+    assert (edges[0, :, 0] == 0).all() and (edges[:, -1, 1] == 0).all()
+
+
+def test_cut_pieces_atlas_matches_geometry():
+    buf = io.BytesIO()
+    Image.fromarray(np.zeros((64, 64, 3), dtype=np.uint8)).save(buf, "PNG")
+    atlas, geometry = cut_pieces(buf.getvalue(), grid_for_difficulty(9), seed=1, atlas_format="PNG")
+    assert Image.open(io.BytesIO(atlas)).size == tuple(geometry["atlas"])
+    assert len(geometry["edges"]) == 9
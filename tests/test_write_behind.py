@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from write_behind import WriteBehindBuffer
+
+
+class FakeCollection:
+    def __init__(self):
+        self.totals = {}
+        self.writes = 0
+        self.fail = False
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.fail:
+            raise ConnectionError("mongo unavailable")
+        self.writes += 1
+        for request in requests:
+            key = request._filter["user_id"]
+            for field, delta in request._doc["$inc"].items():
+                self.totals.setdefault(key, {}).setdefault(field, 0)
+                self.totals[key][field] += delta
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_increments_coalesce_into_one_bulk_write():
+    collection = FakeCollection()
+    flushed = []
+    buffer = WriteBehindBuffer(collection, "user_id", durability="async", flush_interval=60, on_flush=flushed.extend)
+
+    async def scenario():
+        buffer.start()
+        await buffer.increment_many({"a": {"score": 1}, "b": {"score": 2}})
+        await buffer.increment_many({"a": {"score": 3, "count": 1}})
+        assert buffer.depth == 2 and collection.writes == 0
+        await buffer.stop()
+
+    run(scenario())
+    assert collection.writes == 1
+    assert collection.totals == {"a": {"score": 4, "count": 1}, "b": {"score": 2}}
+    assert sorted(flushed) == ["a", "b"]
+    assert buffer.stats["coalesced"] == 1
+
+
+def test_async_mode_retries_a_failed_flush():
+    collection = FakeCollection()
+    buffer = WriteBehindBuffer(collection, "user_id", durability="async", flush_interval=60)
+
+    async def scenario():
+        buffer.start()
+        await buffer.increment_many({"a": {"score": 5}})
+        collection.fail = True
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        assert buffer.depth == 1
+        collection.fail = False
+        await buffer.increment_many({"a": {"score": 1}})
+        await buffer.stop()
+
+    run(scenario())
+    assert collection.totals == {"a": {"score": 6}}
+
+
+def test_ack_mode_failure_is_reported_and_not_applied_later():
+    collection = FakeCollection()
+    buffer = WriteBehindBuffer(collection, "user_id", durability="ack", flush_interval=60)
+
+    async def scenario():
+        buffer.start()
+        collection.fail = True
+        request = asyncio.create_task(buffer.increment_many({"a": {"score": 5}}))
+        await asyncio.sleep(0)
+        await buffer.flush()
+        with pytest.raises(ConnectionError):
+            await request
+        assert buffer.depth == 0
+
+        # The client retries once the database is back
+        collection.fail = False
+        retry = asyncio.create_task(buffer.increment_many({"a": {"score": 5}}))
+        await asyncio.sleep(0)
+        await buffer.flush()
+        await retry
+        await buffer.stop()
+
+    run(scenario())
+    assert collection.totals == {"a": {"score": 5}}
+    assert buffer.stats["dropped_documents"] == 1
+
+
+def test_stop_does_not_raise_when_the_final_flush_fails():
+    collection = FakeCollection()
+    buffer = WriteBehindBuffer(collection, "user_id", durability="async", flush_interval=60)
+
+    async def scenario():
+        buffer.start()
+        await buffer.increment_many({"a": {"score": 5}})
+        collection.fail = True
+        await buffer.stop()
+
+    run(scenario())
+    assert buffer.stats["errors"] == 1
+
+
+def test_off_mode_writes_through():
+    collection = FakeCollection()
+    buffer = WriteBehindBuffer(collection, "user_id", durability="off")
+    run(buffer.increment_many({"a": {"score": 1}}))
+    run(buffer.increment_many({"a": {"score": 1}}))
+    assert collection.writes == 2 and collection.totals == {"a": {"score": 2}}